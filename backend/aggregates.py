@@ -0,0 +1,102 @@
+from typing import Dict, List, Optional
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import lock_for_write
+from models import EventFeatureAggregate, Feedback
+from scoring import empty_aggregate, add_to_aggregate
+
+AGGREGATE_FIELDS = list(empty_aggregate().keys())
+
+
+def feedback_to_dict(feedback: Feedback) -> Dict:
+    return {
+        "text": feedback.text,
+        "rating": feedback.rating,
+        "polarity": feedback.polarity,
+        "hits": feedback.keyword_hits
+    }
+
+
+def aggregate_to_dict(row: EventFeatureAggregate) -> Dict:
+    aggregate = empty_aggregate()
+    for field in AGGREGATE_FIELDS:
+        value = getattr(row, field)
+        if value is not None:
+            aggregate[field] = value
+    return aggregate
+
+
+def _store(row: EventFeatureAggregate, aggregate: Dict):
+    for field in AGGREGATE_FIELDS:
+        setattr(row, field, aggregate[field])
+
+
+def _aggregate_from_feedbacks(db: Session, event_id: int) -> Dict:
+    aggregate = empty_aggregate()
+    feedbacks = db.query(Feedback).filter(Feedback.event_id == event_id).order_by(Feedback.id)
+    for f in feedbacks:
+        aggregate = add_to_aggregate(aggregate, feedback_to_dict(f))
+    return aggregate
+
+
+def _lock_aggregate(db: Session, event_id: int) -> Optional[EventFeatureAggregate]:
+    # FOR UPDATE makes concurrent writers for the same event wait for our commit instead of overwriting
+    # each other's counts; lock_for_write does the same on SQLite, which ignores it
+    lock_for_write(db, EventFeatureAggregate.__table__)
+    return (
+        db.query(EventFeatureAggregate)
+        .filter(EventFeatureAggregate.event_id == event_id)
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+
+
+def _insert_aggregate(db: Session, event_id: int, aggregate: Dict):
+    # Two sessions can both find the row missing; the loser keeps the winner's row rather than failing on the unique event_id
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        db.execute(
+            insert(EventFeatureAggregate)
+            .values(event_id=event_id, **aggregate)
+            .on_conflict_do_nothing(index_elements=[EventFeatureAggregate.event_id])
+        )
+        return
+    db.add(EventFeatureAggregate(event_id=event_id, **aggregate))
+    db.flush()
+
+
+def rebuild_aggregate(db: Session, event_id: int) -> EventFeatureAggregate:
+    return save_aggregate(db, event_id, _aggregate_from_feedbacks(db, event_id))
+
+
+def save_aggregate(db: Session, event_id: int, aggregate: Dict) -> EventFeatureAggregate:
+    row = _lock_aggregate(db, event_id)
+    if row is None:
+        _insert_aggregate(db, event_id, aggregate)
+        row = _lock_aggregate(db, event_id)
+    _store(row, aggregate)
+    return row
+
+
+def load_aggregate(db: Session, event_id: int) -> Dict:
+    row = db.query(EventFeatureAggregate).filter(EventFeatureAggregate.event_id == event_id).first()
+    if row is None:
+        row = rebuild_aggregate(db, event_id)
+    return aggregate_to_dict(row)
+
+
+def add_feedbacks_to_aggregate(db: Session, event_id: int, feedbacks: List[Dict]) -> Dict:
+    # Call before the new Feedback rows are added so a missing aggregate is rebuilt without them.
+    # The row stays locked until the caller commits, so the read-modify-write below cannot lose updates.
+    row = _lock_aggregate(db, event_id)
+    if row is None:
+        _insert_aggregate(db, event_id, _aggregate_from_feedbacks(db, event_id))
+        row = _lock_aggregate(db, event_id)
+    aggregate = aggregate_to_dict(row)
+    for f in feedbacks:
+        aggregate = add_to_aggregate(aggregate, f)
+    _store(row, aggregate)
+    return aggregate
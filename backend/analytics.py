@@ -0,0 +1,261 @@
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import lock_for_write
+from feature_store import load_features
+from models import AnalyticsRollup, Event, Score
+from scoring import CATEGORIES, FEATURE_ORDER, np
+
+GRANULARITIES = ("month", "term")
+ROLLUP_BINS = 200
+PERCENTILES = (25, 50, 75, 90)
+
+METRIC_RANGES = {
+    "value_score": (0.0, 100.0),
+    "feedback_score": (0.0, 100.0),
+    "revenue_score": (0.0, 100.0),
+    "sentiment": (-1.0, 1.0),
+    **{f"category.{cat}": (0.0, 100.0) for cat in CATEGORIES}
+}
+
+# UWaterloo terms: Winter is January-April, Spring May-August, Fall September-December
+TERMS = ((1, "Winter"), (5, "Spring"), (9, "Fall"))
+
+Bucket = Tuple[str, str, date]
+Contribution = Tuple[Optional[datetime], Dict[str, float]]
+
+
+def buckets_for(created_at: Optional[datetime]) -> List[Bucket]:
+    created_at = created_at or datetime.now(timezone.utc)
+    start_month, season = next((month, name) for month, name in reversed(TERMS) if created_at.month >= month)
+    return [
+        ("month", f"{created_at.year:04d}-{created_at.month:02d}", date(created_at.year, created_at.month, 1)),
+        ("term", f"{season} {created_at.year}", date(created_at.year, start_month, 1))
+    ]
+
+
+def _stored(value: Optional[float]) -> float:
+    # Replaced scores are read back from the float32 feature store, so round the same way on the way in;
+    # otherwise a value on a bin edge could be taken out of a different bin than it went into
+    return float(np.float32(value or 0.0))
+
+
+def score_metrics(revenue_score: float, feedback_score: float, value_score: float, feature_vector: Optional[Dict]) -> Dict[str, float]:
+    features = feature_vector or {}
+    metrics = {
+        "value_score": value_score,
+        "feedback_score": feedback_score,
+        "revenue_score": revenue_score,
+        "sentiment": _stored(features.get("sentiment"))
+    }
+    for cat in CATEGORIES:
+        metrics[f"category.{cat}"] = _stored(features.get(cat)) * 100
+    return {metric: float(value) for metric, value in metrics.items() if value is not None}
+
+
+def _with_features(db: Session, rows: List) -> List[Tuple[int, Optional[datetime], Dict[str, float]]]:
+    found, X = load_features(db, [row.event_id for row in rows])
+    features = {event_id: dict(zip(FEATURE_ORDER, x)) for event_id, x in zip(found, X.tolist())}
+    return [
+        (row.event_id, row.created_at, score_metrics(row.revenue_score, row.feedback_score, row.value_score, features.get(row.event_id)))
+        for row in rows
+    ]
+
+
+def load_contributions(db: Session, event_ids: Iterable[int]) -> Dict[int, Contribution]:
+    event_ids = list(event_ids)
+    if not event_ids:
+        return {}
+    rows = (
+        db.query(Score.event_id, Score.revenue_score, Score.feedback_score, Score.value_score, Event.created_at)
+        .join(Event, Event.id == Score.event_id)
+        .filter(Score.event_id.in_(event_ids))
+        .all()
+    )
+    return {event_id: (created_at, metrics) for event_id, created_at, metrics in _with_features(db, rows)}
+
+
+def _bin(metric: str, value: float) -> int:
+    low, high = METRIC_RANGES[metric]
+    return min(ROLLUP_BINS - 1, max(0, int((value - low) / (high - low) * ROLLUP_BINS)))
+
+
+def _percentiles(histogram: List[int], count: int, low: float, high: float) -> List[float]:
+    width = (high - low) / ROLLUP_BINS
+    targets = [q / 100 * count for q in PERCENTILES]
+    values = []
+    cumulative = 0
+    for i, n in enumerate(histogram):
+        while n and targets and cumulative + n >= targets[0]:
+            values.append(low + (i + (targets.pop(0) - cumulative) / n) * width)
+        if not targets:
+            break
+        cumulative += n
+    return values + [high] * len(targets)
+
+
+def _collect(deltas: Dict, contributions: Iterable[Contribution], sign: int):
+    for created_at, metrics in contributions:
+        for bucket in buckets_for(created_at):
+            for metric, value in metrics.items():
+                if metric not in METRIC_RANGES:
+                    continue
+                delta = deltas[bucket + (metric,)]
+                delta["count"] += sign
+                delta["total"] += sign * value
+                delta["bins"][_bin(metric, value)] += sign
+
+
+def _new_delta():
+    return {"count": 0, "total": 0.0, "bins": defaultdict(int)}
+
+
+def _refresh(row: AnalyticsRollup):
+    low, high = METRIC_RANGES[row.metric]
+    row.mean = row.total / row.count if row.count else None
+    values = _percentiles(row.histogram, row.count, low, high) if row.count else [None] * len(PERCENTILES)
+    for q, value in zip(PERCENTILES, values):
+        setattr(row, f"p{q}", value)
+
+
+def _lock_rollups(db: Session, periods: Set[str], metrics: Set[str]) -> Dict[Tuple[str, str, str], AnalyticsRollup]:
+    query = (
+        db.query(AnalyticsRollup)
+        .filter(AnalyticsRollup.period.in_(periods), AnalyticsRollup.metric.in_(metrics))
+        .with_for_update()
+        .populate_existing()
+    )
+    return {(row.granularity, row.period, row.metric): row for row in query}
+
+
+def _insert_rollups(db: Session, buckets: List[Tuple[str, str, date, str]]):
+    # Empty buckets; a session that lost the race to create one keeps the winner's row
+    values = [
+        dict(granularity=granularity, period=period, period_start=period_start, metric=metric, count=0, total=0.0, histogram=[0] * ROLLUP_BINS)
+        for granularity, period, period_start, metric in buckets
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        db.execute(
+            insert(AnalyticsRollup)
+            .values(values)
+            .on_conflict_do_nothing(index_elements=[AnalyticsRollup.granularity, AnalyticsRollup.period, AnalyticsRollup.metric])
+        )
+        return
+    db.add_all([AnalyticsRollup(**row) for row in values])
+    db.flush()
+
+
+def update_rollups(db: Session, removed: Iterable[Contribution] = (), added: Iterable[Contribution] = ()):
+    deltas = defaultdict(_new_delta)
+    _collect(deltas, removed, -1)
+    _collect(deltas, added, 1)
+    if not deltas:
+        return
+
+    # Lock the buckets before reading them, as aggregates.py does, so a concurrent writer cannot
+    # apply its delta to the same counts and overwrite ours
+    lock_for_write(db, AnalyticsRollup.__table__)
+    periods = {period for _, period, _, _ in deltas}
+    metrics = {metric for _, _, _, metric in deltas}
+    rows = _lock_rollups(db, periods, metrics)
+    missing = [key for key, delta in deltas.items() if (key[0], key[1], key[3]) not in rows and delta["count"] > 0]
+    if missing:
+        _insert_rollups(db, missing)
+        rows = _lock_rollups(db, periods, metrics)
+    for (granularity, period, period_start, metric), delta in deltas.items():
+        row = rows.get((granularity, period, metric))
+        if row is None:
+            continue
+        histogram = list(row.histogram or [0] * ROLLUP_BINS)
+        for i, n in delta["bins"].items():
+            histogram[i] = max(0, histogram[i] + n)
+        row.histogram = histogram
+        row.count = max(0, row.count + delta["count"])
+        row.total = row.total + delta["total"] if row.count else 0.0
+        _refresh(row)
+
+
+def record_scores(db: Session, scores: Dict[int, Optional[Dict[str, float]]]):
+    # Call before the Score rows change so the previous values can be taken back out of their buckets.
+    if not scores:
+        return
+    # Before reading the old values: on SQLite another process could otherwise change them before our write lock
+    lock_for_write(db, AnalyticsRollup.__table__)
+    previous = load_contributions(db, scores)
+    created = dict(db.query(Event.id, Event.created_at).filter(Event.id.in_(list(scores))))
+    removed, added = [], []
+    for event_id, metrics in scores.items():
+        if event_id in previous:
+            created_at, old = previous[event_id]
+            if metrics is not None:
+                # Unchanged values would only be taken out of and put back into the same bin
+                unchanged = {metric for metric, value in metrics.items() if old.get(metric) == value}
+                old = {metric: value for metric, value in old.items() if metric not in unchanged}
+                metrics = {metric: value for metric, value in metrics.items() if metric not in unchanged}
+            removed.append((created_at, old))
+        if metrics is not None:
+            added.append((created.get(event_id), metrics))
+    update_rollups(db, removed=removed, added=added)
+
+
+def rebuild_rollups(db: Session, batch_size: int = 1000) -> int:
+    db.query(AnalyticsRollup).delete()
+    deltas = defaultdict(_new_delta)
+    total = 0
+    rows = (
+        db.query(Score.event_id, Score.revenue_score, Score.feedback_score, Score.value_score, Event.created_at)
+        .join(Event, Event.id == Score.event_id)
+        .order_by(Score.event_id)
+    )
+    last_id = 0
+    while True:
+        batch = rows.filter(Score.event_id > last_id).limit(batch_size).all()
+        if not batch:
+            break
+        _collect(deltas, [(created_at, metrics) for _, created_at, metrics in _with_features(db, batch)], 1)
+        total += len(batch)
+        last_id = batch[-1].event_id
+
+    for (granularity, period, period_start, metric), delta in deltas.items():
+        histogram = [0] * ROLLUP_BINS
+        for i, n in delta["bins"].items():
+            histogram[i] = n
+        row = AnalyticsRollup(granularity=granularity, period=period, period_start=period_start, metric=metric, count=delta["count"], total=delta["total"], histogram=histogram)
+        _refresh(row)
+        db.add(row)
+    db.commit()
+    return total
+
+
+def trends(db: Session, granularity: str = "month", metrics: Optional[Iterable[str]] = None, limit: Optional[int] = None) -> List[Dict]:
+    query = db.query(AnalyticsRollup).filter(AnalyticsRollup.granularity == granularity, AnalyticsRollup.count > 0)
+    if metrics:
+        query = query.filter(AnalyticsRollup.metric.in_(list(metrics)))
+    if limit:
+        starts = [
+            start for (start,) in db.query(AnalyticsRollup.period_start)
+            .filter(AnalyticsRollup.granularity == granularity, AnalyticsRollup.count > 0)
+            .distinct()
+            .order_by(AnalyticsRollup.period_start.desc())
+            .limit(limit)
+        ]
+        if not starts:
+            return []
+        query = query.filter(AnalyticsRollup.period_start >= min(starts))
+
+    periods: Dict[str, Dict] = {}
+    for row in query.order_by(AnalyticsRollup.period_start, AnalyticsRollup.metric):
+        entry = periods.setdefault(row.period, {"period": row.period, "start": row.period_start.isoformat(), "events": 0, "metrics": {}})
+        entry["metrics"][row.metric] = {
+            "count": row.count,
+            "mean": round(row.mean, 3),
+            **{f"p{q}": round(getattr(row, f"p{q}"), 3) for q in PERCENTILES}
+        }
+        entry["events"] = max(entry["events"], row.count)
+    return list(periods.values())
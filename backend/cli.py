@@ -0,0 +1,147 @@
+import argparse
+import json
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from aggregates import rebuild_aggregate
+from analytics import rebuild_rollups
+from database import SessionLocal, create_missing_indexes, init_db
+from feature_store import rebuild_feature_store
+from models import Event, Feedback
+from rescore import rescore_events
+from revenue import backfill_revenue_per_attendee, mark_stale_scores, refresh_stale_scores
+from scoring import analyze_feedbacks
+from sentiment import BACKENDS, SENTIMENT_BACKEND, build_lexicon, parity_report
+from training import rebuild_training_stats, retrain_model
+
+
+def backfill_feedback(db: Session, batch_size: int = 500, reanalyze: bool = False) -> int:
+    total = 0
+    last_id = 0
+    while True:
+        query = db.query(Feedback).filter(Feedback.id > last_id)
+        if not reanalyze:
+            query = query.filter((Feedback.polarity.is_(None)) | (Feedback.keyword_hits.is_(None)))
+        feedbacks = query.order_by(Feedback.id).limit(batch_size).all()
+        if not feedbacks:
+            return total
+        for f, analysis in zip(feedbacks, analyze_feedbacks([f.text or "" for f in feedbacks])):
+            f.polarity = analysis["polarity"]
+            f.keyword_hits = analysis["hits"]
+        db.commit()
+        total += len(feedbacks)
+        last_id = feedbacks[-1].id
+
+
+def rebuild_aggregates(db: Session) -> int:
+    event_ids = [event_id for (event_id,) in db.query(Event.id).order_by(Event.id)]
+    for event_id in event_ids:
+        rebuild_aggregate(db, event_id)
+        db.commit()
+    return len(event_ids)
+
+
+def dedupe_feedback(db: Session) -> int:
+    # Keep the first response per respondent, as the unique index would have
+    first = (
+        db.query(func.min(Feedback.id))
+        .filter(Feedback.respondent_id.isnot(None))
+        .group_by(Feedback.event_id, Feedback.respondent_id)
+    )
+    duplicates = db.query(Feedback.id, Feedback.event_id).filter(Feedback.respondent_id.isnot(None), Feedback.id.notin_(first)).all()
+    if not duplicates:
+        return 0
+    db.query(Feedback).filter(Feedback.id.in_([feedback_id for feedback_id, _ in duplicates])).delete(synchronize_session=False)
+    for event_id in sorted({event_id for _, event_id in duplicates}):
+        rebuild_aggregate(db, event_id)
+    db.commit()
+    return len(duplicates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PSA Andaza maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    backfill = subparsers.add_parser("backfill", help="Store sentiment and keyword hits for feedback submitted before they were persisted")
+    backfill.add_argument("--batch-size", type=int, default=500)
+    backfill.add_argument("--all", action="store_true", help="Re-analyze every feedback with the configured sentiment backend and rebuild aggregates")
+
+    subparsers.add_parser("dedupe-feedback", help="Delete repeat feedback from the same respondent so the unique index can be created")
+
+    subparsers.add_parser("rebuild-aggregates", help="Recompute every event's feature aggregate from its stored feedback")
+
+    rescore = subparsers.add_parser("rescore", help="Recompute every stored score with the current model version")
+    rescore.add_argument("--chunk-size", type=int, default=200)
+    rescore.add_argument("--workers", type=int, default=None, help="Process pool size (default: serial below RESCORE_PARALLEL_MIN_EVENTS events)")
+    rescore.add_argument("--only-stale", action="store_true", help="Skip scores already computed with the current model version")
+
+    subparsers.add_parser("refresh-revenue", help="Recompute the revenue half of every score whose revenue benchmark has moved")
+
+    subparsers.add_parser("rebuild-analytics", help="Recompute the monthly and per-term trend rollups from every stored score")
+
+    subparsers.add_parser("rebuild-features", help="Rewrite the memory-mapped feature store from every stored score's feature JSON")
+
+    subparsers.add_parser("retrain", help="Rebuild the training statistics from every label and refit the model")
+
+    subparsers.add_parser("build-lexicon", help="Regenerate the lexicon sentiment backend's word list from TextBlob's lexicon")
+
+    parity = subparsers.add_parser("sentiment-parity", help="Compare a sentiment backend against TextBlob on stored feedback")
+    parity.add_argument("--backend", choices=sorted(BACKENDS), default="lexicon")
+    parity.add_argument("--limit", type=int, default=None)
+
+    args = parser.parse_args(argv)
+    if args.command == "build-lexicon":
+        print(f"Wrote {build_lexicon()} words")
+        return
+
+    init_db()
+    db = SessionLocal()
+    try:
+        backfill_revenue_per_attendee(db)
+        if args.command == "backfill":
+            count = backfill_feedback(db, args.batch_size, reanalyze=args.all)
+            print(f"Backfilled {count} feedbacks with the {SENTIMENT_BACKEND} sentiment backend")
+            if args.all:
+                print(f"Rebuilt aggregates for {rebuild_aggregates(db)} events")
+        elif args.command == "dedupe-feedback":
+            count = dedupe_feedback(db)
+            create_missing_indexes()
+            print(f"Deleted {count} duplicate feedbacks" + ("; run `python cli.py rescore` to update their events' scores" if count else ""))
+        elif args.command == "rebuild-aggregates":
+            count = rebuild_aggregates(db)
+            print(f"Rebuilt aggregates for {count} events")
+        elif args.command == "rescore":
+            report = rescore_events(
+                db,
+                chunk_size=args.chunk_size,
+                workers=args.workers,
+                only_stale=args.only_stale,
+                progress=lambda p: print(f"Rescored {p['done']}/{p['total']} events ({p['events_per_sec']:.1f} events/sec)")
+            )
+            print(f"Rescored {report['events']} events with model version {report['model_version']} "
+                  f"in {report['seconds']}s ({report['events_per_sec']} events/sec)")
+            if report["labels_changed"]:
+                retrain_model(db)
+                print(f"Retrained model after {report['labels_changed']} labeled events changed features")
+        elif args.command == "refresh-revenue":
+            marked = mark_stale_scores(db)
+            print(f"Refreshed revenue scores for {len(refresh_stale_scores(db))} events ({len(marked)} newly stale)")
+        elif args.command == "rebuild-analytics":
+            print(f"Rebuilt analytics rollups from {rebuild_rollups(db)} scores")
+        elif args.command == "rebuild-features":
+            print(f"Rebuilt feature store from {rebuild_feature_store(db)} scores")
+        elif args.command == "retrain":
+            stats = rebuild_training_stats(db)
+            weights = retrain_model(db)
+            print(f"Retrained on {stats.n} labels" if weights else f"Only {stats.n} labels, need 5 to train")
+        elif args.command == "sentiment-parity":
+            texts = db.query(Feedback.text).order_by(Feedback.id)
+            if args.limit:
+                texts = texts.limit(args.limit)
+            print(json.dumps(parity_report([text or "" for (text,) in texts], candidate=args.backend), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
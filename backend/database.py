@@ -1,19 +1,162 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, StaticPool
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./psa_events.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "temp_store": "MEMORY"
+}
+
+
+def _set_sqlite_pragmas(engine: Engine, query_only: bool):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def create_engines(url: str = DATABASE_URL):
+    parsed = make_url(url)
+    if not parsed.drivername.startswith("sqlite"):
+        engine = create_engine(
+            url,
+            poolclass=QueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=True,
+            pool_recycle=1800
+        )
+        return engine, engine
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000}
+    if parsed.database in (None, "", ":memory:"):
+        engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+        _set_sqlite_pragmas(engine, query_only=False)
+        return engine, engine
+
+    write_engine = create_engine(url, connect_args=connect_args, poolclass=QueuePool, pool_size=1, max_overflow=0, pool_timeout=DB_POOL_TIMEOUT)
+    read_engine = create_engine(url, connect_args=connect_args, poolclass=QueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    _set_sqlite_pragmas(write_engine, query_only=False)
+    _set_sqlite_pragmas(read_engine, query_only=True)
+    return read_engine, write_engine
+
+
+read_engine, engine = create_engines()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
-def get_db():
+async def get_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_write_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+def add_missing_columns():
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def lock_for_write(db, table):
+    # SQLite ignores FOR UPDATE and only takes its write lock at a transaction's first write, so two processes
+    # can both read a row before either writes it back and one update is lost. A write that matches nothing
+    # takes the lock before the read; other writers then wait for our commit.
+    if db.get_bind().dialect.name == "sqlite":
+        key = next(iter(table.primary_key.columns)).name
+        db.execute(text(f"UPDATE {table.name} SET {key} = {key} WHERE 0"))
+
+def duplicate_rows(index) -> int:
+    # Rows beyond the first for each key a unique index would reject; NULLs never collide
+    columns = [column.name for column in index.columns]
+    with engine.connect() as conn:
+        return conn.execute(text(
+            f"SELECT COALESCE(SUM(n - 1), 0) FROM (SELECT COUNT(*) AS n FROM {index.table.name} "
+            f"WHERE {' AND '.join(f'{c} IS NOT NULL' for c in columns)} "
+            f"GROUP BY {', '.join(columns)} HAVING COUNT(*) > 1) AS duplicates"
+        )).scalar()
+
+def create_missing_indexes():
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                duplicates = duplicate_rows(index)
+                if duplicates:
+                    # Databases from before the index was added may hold duplicates; keep starting rather than fail
+                    logger.warning(
+                        "Skipping unique index %s: %d rows in %s repeat an existing (%s). "
+                        "Run `python cli.py dedupe-feedback` to remove them; the index is created on the next start.",
+                        index.name, duplicates, table.name, ", ".join(column.name for column in index.columns)
+                    )
+                    continue
+            index.create(bind=engine)
+
+FEEDBACK_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS feedbacks_fts USING fts5(text, content='feedbacks', content_rowid='id', tokenize='porter unicode61')",
+    """CREATE TRIGGER IF NOT EXISTS feedbacks_fts_insert AFTER INSERT ON feedbacks BEGIN
+        INSERT INTO feedbacks_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS feedbacks_fts_delete AFTER DELETE ON feedbacks BEGIN
+        INSERT INTO feedbacks_fts(feedbacks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS feedbacks_fts_update AFTER UPDATE OF text ON feedbacks BEGIN
+        INSERT INTO feedbacks_fts(feedbacks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO feedbacks_fts(rowid, text) VALUES (new.id, new.text);
+    END"""
+]
+
+def search_index_available() -> bool:
+    return engine.dialect.name == "sqlite"
+
+def create_search_index():
+    if not search_index_available():
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feedbacks_fts'")).first()
+        for statement in FEEDBACK_SEARCH_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text("INSERT INTO feedbacks_fts(feedbacks_fts) VALUES ('rebuild')"))
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    create_missing_indexes()
+    create_search_index()
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from database import DATABASE_URL
+from models import Score
+from scoring import FEATURE_ORDER, feature_matrix, np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+FEATURE_STORE_PATH = os.getenv("FEATURE_STORE_PATH")
+FEATURE_STORE_INITIAL_ROWS = int(os.getenv("FEATURE_STORE_INITIAL_ROWS", "1024"))
+
+FEATURE_DTYPE = "float32"
+ID_DTYPE = "int64"
+TOMBSTONE = -1
+
+
+def default_path(url: str = DATABASE_URL) -> Optional[str]:
+    if FEATURE_STORE_PATH:
+        return FEATURE_STORE_PATH
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        return url.database + ".features"
+    return None
+
+
+# matrix.f32 is a preallocated N x D float32 matrix opened with numpy.memmap; ids.i64 holds the
+# event id of each used row (TOMBSTONE once deleted). Without a path both are kept in memory.
+class FeatureStore:
+    def __init__(self, path: Optional[str], feature_order: Sequence[str] = FEATURE_ORDER):
+        self.path = path
+        self.feature_order = list(feature_order)
+        self.width = len(self.feature_order)
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._load()
+
+    @property
+    def _ids_path(self) -> str:
+        return os.path.join(self.path, "ids.i64")
+
+    @property
+    def _matrix_path(self) -> str:
+        return os.path.join(self.path, "matrix.f32")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._index)
+
+    def _row_bytes(self) -> int:
+        return self.width * np.dtype(FEATURE_DTYPE).itemsize
+
+    def _stat(self):
+        ids, matrix = os.stat(self._ids_path), os.stat(self._matrix_path)
+        return ids.st_size, ids.st_mtime_ns, matrix.st_size
+
+    def _load(self):
+        if self.path is None:
+            self._matrix = np.zeros((FEATURE_STORE_INITIAL_ROWS, self.width), dtype=FEATURE_DTYPE)
+            self._ids = np.full(FEATURE_STORE_INITIAL_ROWS, TOMBSTONE, dtype=ID_DTYPE)
+            self._rows = 0
+            self._index: Dict[int, int] = {}
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+        if not meta or meta.get("feature_order") != self.feature_order or meta.get("dtype") != FEATURE_DTYPE:
+            self._reset_files()
+
+        with open(self._ids_path, "rb") as f:
+            raw = f.read()
+        ids = np.frombuffer(raw[:len(raw) - len(raw) % 8], dtype=ID_DTYPE)
+        capacity = max(FEATURE_STORE_INITIAL_ROWS, os.path.getsize(self._matrix_path) // self._row_bytes())
+        if len(ids) > capacity:
+            # The matrix never grew to cover these ids; drop them rather than serve zeros
+            ids = ids[:capacity]
+            with open(self._ids_path, "r+b") as f:
+                f.truncate(len(ids) * 8)
+        self._map(capacity)
+        self._ids = np.full(capacity, TOMBSTONE, dtype=ID_DTYPE)
+        self._ids[:len(ids)] = ids
+        self._rows = len(ids)
+        self._index = {int(event_id): row for row, event_id in enumerate(ids.tolist()) if event_id != TOMBSTONE}
+        self._stamp = self._stat()
+
+    def _reset_files(self):
+        with open(self._ids_path, "wb"):
+            pass
+        with open(self._matrix_path, "wb") as f:
+            f.truncate(FEATURE_STORE_INITIAL_ROWS * self._row_bytes())
+        with open(self._meta_path, "w") as f:
+            json.dump({"feature_order": self.feature_order, "dtype": FEATURE_DTYPE}, f)
+
+    def _map(self, capacity: int):
+        if os.path.getsize(self._matrix_path) < capacity * self._row_bytes():
+            with open(self._matrix_path, "r+b") as f:
+                f.truncate(capacity * self._row_bytes())
+        self._matrix = np.memmap(self._matrix_path, dtype=FEATURE_DTYPE, mode="r+", shape=(capacity, self.width))
+
+    def _refresh(self):
+        # Other processes (the CLI, other workers) append or delete rows; reload when the files changed under us
+        if self.path is not None and self._stat() != self._stamp:
+            self._load()
+
+    @contextmanager
+    def _writing(self):
+        with self._lock:
+            if self.path is None or fcntl is None:
+                yield
+                return
+            with open(self._ids_path, "rb") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    yield
+                    self._stamp = self._stat()
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _grow(self, rows: int):
+        capacity = len(self._ids)
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2)
+        ids = np.full(capacity, TOMBSTONE, dtype=ID_DTYPE)
+        ids[:self._rows] = self._ids[:self._rows]
+        self._ids = ids
+        if self.path is None:
+            matrix = np.zeros((capacity, self.width), dtype=FEATURE_DTYPE)
+            matrix[:self._rows] = self._matrix[:self._rows]
+            self._matrix = matrix
+        else:
+            self._matrix.flush()
+            self._map(capacity)
+
+    def put(self, event_ids: Sequence[int], X) -> None:
+        X = np.asarray(X, dtype=FEATURE_DTYPE).reshape(len(event_ids), self.width)
+        with self._writing():
+            rows = []
+            appended = []
+            for event_id in event_ids:
+                row = self._index.get(event_id)
+                if row is None:
+                    row = self._index[event_id] = self._rows + len(appended)
+                    appended.append(event_id)
+                rows.append(row)
+            self._grow(self._rows + len(appended))
+            self._matrix[rows] = X
+            if appended:
+                self._ids[self._rows:self._rows + len(appended)] = appended
+                if self.path is not None:
+                    with open(self._ids_path, "ab") as f:
+                        f.write(np.asarray(appended, dtype=ID_DTYPE).tobytes())
+                self._rows += len(appended)
+
+    def put_features(self, features: Dict[int, Dict]) -> None:
+        if features:
+            self.put(list(features), feature_matrix(list(features.values()), self.feature_order))
+
+    def delete(self, event_ids: Iterable[int]) -> None:
+        with self._writing():
+            rows = [self._index.pop(event_id) for event_id in event_ids if event_id in self._index]
+            if not rows:
+                return
+            self._ids[rows] = TOMBSTONE
+            if self.path is not None:
+                tombstone = np.asarray([TOMBSTONE], dtype=ID_DTYPE).tobytes()
+                with open(self._ids_path, "r+b") as f:
+                    for row in rows:
+                        f.seek(row * 8)
+                        f.write(tombstone)
+
+    def take(self, event_ids: Sequence[int]) -> Tuple[List[int], np.ndarray]:
+        with self._lock:
+            self._refresh()
+            found = [event_id for event_id in event_ids if event_id in self._index]
+            return found, self._matrix[[self._index[event_id] for event_id in found]]
+
+    def scan(self) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            self._refresh()
+            ids, matrix = self._ids[:self._rows], self._matrix[:self._rows]
+            if len(self._index) == self._rows:
+                return ids.copy(), matrix
+            live = ids != TOMBSTONE
+            return ids[live], matrix[live]
+
+    def clear(self) -> None:
+        with self._writing():
+            if self.path is not None:
+                self._reset_files()
+            self._load()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self.path is not None:
+                self._matrix.flush()
+
+
+_store: Optional[FeatureStore] = None
+_store_lock = threading.Lock()
+
+
+def get_feature_store() -> FeatureStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FeatureStore(default_path())
+    return _store
+
+
+def load_features(db: Session, event_ids: Sequence[int]) -> Tuple[List[int], np.ndarray]:
+    # Scores written before the store existed (or by another deployment) are backfilled from their JSON on first read
+    store = get_feature_store()
+    found, X = store.take(event_ids)
+    present = set(found)
+    missing = [event_id for event_id in event_ids if event_id not in present]
+    if missing:
+        features = {
+            event_id: vector
+            for event_id, vector in db.query(Score.event_id, Score.feature_vector).filter(Score.event_id.in_(missing))
+            if vector
+        }
+        if features:
+            store.put_features(features)
+            found, X = store.take(event_ids)
+    return found, X
+
+
+def rebuild_feature_store(db: Session, batch_size: int = 1000) -> int:
+    store = get_feature_store()
+    store.clear()
+    total = 0
+    batch: Dict[int, Dict] = {}
+    for event_id, vector in db.query(Score.event_id, Score.feature_vector).order_by(Score.event_id).yield_per(batch_size):
+        if vector:
+            batch[event_id] = vector
+        if len(batch) >= batch_size:
+            store.put_features(batch)
+            total += len(batch)
+            batch = {}
+    store.put_features(batch)
+    store.flush()
+    return total + len(batch)
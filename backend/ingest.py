@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from aggregates import add_feedbacks_to_aggregate
+from models import Feedback
+from scoring import analyze_feedbacks
+
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+def store_feedbacks(db: Session, event_id: int, items: List[Dict], analyses: Optional[List[Dict]] = None) -> Dict:
+    if analyses is None:
+        analyses = analyze_feedbacks([item["text"] for item in items])
+    analyzed = [{**item, **analysis} for item, analysis in zip(items, analyses)]
+    aggregate = add_feedbacks_to_aggregate(db, event_id, analyzed)
+    if analyzed:
+        db.execute(insert(Feedback), [
+            {
+                "event_id": event_id,
+                "respondent_id": f["respondent_id"],
+                "text": f["text"],
+                "rating": f["rating"],
+                "polarity": f["polarity"],
+                "keyword_hits": f["hits"]
+            }
+            for f in analyzed
+        ])
+    return aggregate
+
+
+def _upload_format(content_type: str, filename: str = "") -> str:
+    content_type = content_type.lower()
+    filename = filename.lower()
+    if "csv" in content_type or filename.endswith(".csv"):
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or filename.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    raise HTTPException(status_code=415, detail="Upload must be CSV or NDJSON")
+
+
+async def read_upload(request: Request) -> Tuple[BinaryIO, str]:
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing 'file' upload")
+        upload.file.seek(0)
+        return upload.file, _upload_format(upload.content_type or "", upload.filename or "")
+
+    upload_format = _upload_format(content_type)
+    spool = SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, upload_format
+
+
+def iter_rows(file: BinaryIO, upload_format: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    # Bad bytes or broken CSV quoting leave the reader unable to find the next row, so they reject the whole upload
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    row_number = 0
+    try:
+        if upload_format == "csv":
+            for row_number, row in enumerate(csv.DictReader(text), start=1):
+                yield row_number, row, None
+            return
+
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield row_number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(row, dict):
+                yield row_number, None, "Each line must be a JSON object"
+                continue
+            yield row_number, row, None
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload is not valid UTF-8 text")
+    except csv.Error as exc:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV at row {row_number + 1}: {exc}")
+    finally:
+        text.detach()
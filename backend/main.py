@@ -1,28 +1,77 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field
-from typing import List, Optional
-import random
-import string
+from pydantic import BaseModel, Field, ValidationError
+from typing import BinaryIO, Dict, List, Optional
 
-from database import get_db, init_db
+from database import SessionLocal, engine, get_db, get_write_db, init_db, read_engine, search_index_available
+from metrics import DEBUG_TIMING_HEADER, PROMETHEUS_CONTENT_TYPE, finish_request, instrument_engine, registry, start_request, timer, timing_header
 from models import Event, Feedback, Score, TrainingLabel, ModelState
+from aggregates import load_aggregate
+from analytics import METRIC_RANGES, record_scores, score_metrics, trends
+from feature_store import get_feature_store
+from ingest import iter_rows, read_upload, store_feedbacks
+from model_cache import get_active_model
+from pagination import NDJSON, paginate
+from rescore import RESCORE_MAX_WORKERS, rescore_events
+from search import search_feedbacks
+from simulate import simulate_rankings
+from response_cache import ANALYTICS, HISTORY, MODEL, cached_response, invalidate, invalidate_all, score_scope
+from sentiment import get_backend as get_sentiment_backend
+from respondents import consume_token, consume_tokens, ensure_tokens, issue_tokens, known_tokens, list_tokens, token_counts, token_exists, unused_tokens
+from write_behind import FEEDBACK_WRITE_MODE, WRITE_MODES, feedback_queue
+from training import record_label, remove_label, retrain_in_background, sync_label_features
+from revenue import backfill_revenue_per_attendee, get_revenue_index, mark_stale_scores, refresh_stale_revenue
 from scoring import (
-    compute_feedback_score,
+    analyze_feedbacks,
+    compute_aggregate_score,
     compute_revenue_score,
     compute_value_score,
-    train_model,
-    extract_features
+    np,
+    revenue_benchmark,
+    RUBRIC_WEIGHTS,
+    VALUE_WEIGHTS
 )
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    get_sentiment_backend()
+    if FEEDBACK_WRITE_MODE not in WRITE_MODES:
+        raise ValueError(f"Unknown FEEDBACK_WRITE_MODE '{FEEDBACK_WRITE_MODE}', expected one of {', '.join(WRITE_MODES)}")
     init_db()
-    yield
+    db = SessionLocal()
+    try:
+        backfill_revenue_per_attendee(db)
+        mark_stale_scores(db)
+        db.commit()
+    finally:
+        db.close()
+    if FEEDBACK_WRITE_MODE == "group":
+        feedback_queue.start()
+    try:
+        yield
+    finally:
+        feedback_queue.stop()
 
 app = FastAPI(title="PSA Andaza", lifespan=lifespan)
+instrument_engine(engine)
+instrument_engine(read_engine)
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    timings = start_request()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    elapsed = finish_request(timings, route.path if route else "unmatched", request.method, response.status_code)
+    if request.headers.get(DEBUG_TIMING_HEADER):
+        response.headers[DEBUG_TIMING_HEADER] = timing_header(timings, elapsed)
+    return response
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +79,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", DEBUG_TIMING_HEADER],
 )
 
 class EventCreate(BaseModel):
@@ -66,6 +116,34 @@ class ScoreResponse(BaseModel):
 class TrainingLabelCreate(BaseModel):
     admin_label: float = Field(..., ge=0, le=100)
 
+class SearchResult(BaseModel):
+    id: int
+    event_id: int
+    event_name: str
+    respondent_id: str
+    text: str
+    rating: Optional[int]
+    snippet: str
+    score: float
+
+class TrendMetric(BaseModel):
+    count: int
+    mean: float
+    p25: float
+    p50: float
+    p75: float
+    p90: float
+
+class TrendPeriod(BaseModel):
+    period: str
+    start: str
+    events: int
+    metrics: Dict[str, TrendMetric]
+
+class TrendsResponse(BaseModel):
+    granularity: str
+    periods: List[TrendPeriod]
+
 class HistoryItem(BaseModel):
     id: int
     name: str
@@ -76,33 +154,114 @@ class HistoryItem(BaseModel):
     value_score: float
     created_at: str
 
-
-def generate_respondent_id() -> str:
-    return "R-" + "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
+class RubricWeights(BaseModel):
+    base: float = RUBRIC_WEIGHTS["base"]
+    sentiment: float = RUBRIC_WEIGHTS["sentiment"]
+    rating: float = RUBRIC_WEIGHTS["rating"]
+    positive: float = RUBRIC_WEIGHTS["positive"]
+    negative: float = RUBRIC_WEIGHTS["negative"]
+    category: float = RUBRIC_WEIGHTS["category"]
+
+class SimulateRequest(BaseModel):
+    feedback_weight: float = Field(VALUE_WEIGHTS["feedback"], ge=0)
+    revenue_weight: float = Field(VALUE_WEIGHTS["revenue"], ge=0)
+    rubric: Optional[RubricWeights] = None
+    order: str = Field("rank", pattern="^(rank|change)$")
+    limit: int = Field(50, ge=1, le=1000)
+
+class SimulatedEvent(BaseModel):
+    event_id: int
+    name: str
+    feedback_score: float
+    revenue_score: float
+    current_value_score: float
+    value_score: float
+    current_rank: int
+    rank: int
+    rank_change: int
+
+class SimulateResponse(BaseModel):
+    events: int
+    moved: int
+    weights: Dict[str, float]
+    feedback: str
+    rescored: int
+    rank_correlation: Optional[float]
+    results: List[SimulatedEvent]
+
+
+def _event_summaries(db: Session):
+    feedback_counts = (
+        db.query(Feedback.event_id, func.count(Feedback.id).label("feedback_count"))
+        .group_by(Feedback.event_id)
+        .subquery()
+    )
+    return (
+        db.query(
+            Event.id,
+            Event.name,
+            Event.attendance,
+            Event.revenue,
+            Event.created_at,
+            func.coalesce(feedback_counts.c.feedback_count, 0).label("feedback_count"),
+            Score.id.isnot(None).label("has_score")
+        )
+        .outerjoin(feedback_counts, feedback_counts.c.event_id == Event.id)
+        .outerjoin(Score, Score.event_id == Event.id)
+    )
 
 
 @app.get("/api/events", response_model=List[EventResponse])
-def get_events(db: Session = Depends(get_db)):
-    events = db.query(Event).order_by(Event.created_at.desc()).all()
-    return [
-        EventResponse(
+def get_events(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    return paginate(
+        request, response, _event_summaries(db), Event.created_at, Event.id,
+        lambda e: EventResponse(
             id=e.id,
             name=e.name,
             attendance=e.attendance,
             revenue=e.revenue,
-            feedback_count=len(e.feedbacks),
-            has_score=e.score is not None
-        )
-        for e in events
-    ]
+            feedback_count=e.feedback_count,
+            has_score=e.has_score
+        ),
+        cursor=cursor, limit=limit, descending=True
+    )
+
+
+def _revenue_benchmark_changed(db: Session, background_tasks: BackgroundTasks):
+    # Runs after the event change is committed so the benchmark is read back from the database
+    stale = mark_stale_scores(db)
+    db.commit()
+    if stale:
+        invalidate(HISTORY, *(score_scope(event_id) for event_id in stale))
+        background_tasks.add_task(refresh_stale_revenue)
+
+
+def _refresh_stale_revenue(db: Session, event_ids: Optional[List[int]] = None):
+    refresh_stale_revenue(event_ids)
+    # End the read transaction so the next query sees the refreshed rows
+    db.rollback()
 
 
 @app.post("/api/events", response_model=EventResponse)
-def create_event(event: EventCreate, db: Session = Depends(get_db)):
-    db_event = Event(name=event.name, attendance=event.attendance, revenue=event.revenue)
+def create_event(event: EventCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_write_db)):
+    db_event = Event(
+        name=event.name,
+        attendance=event.attendance,
+        revenue=event.revenue,
+        revenue_per_attendee=event.revenue / event.attendance
+    )
     db.add(db_event)
+    db.flush()
+    issue_tokens(db, db_event.id)
     db.commit()
     db.refresh(db_event)
+    _revenue_benchmark_changed(db, background_tasks)
     return EventResponse(
         id=db_event.id,
         name=db_event.name,
@@ -115,7 +274,7 @@ def create_event(event: EventCreate, db: Session = Depends(get_db)):
 
 @app.get("/api/events/{event_id}")
 def get_event(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = _event_summaries(db).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return {
@@ -123,115 +282,204 @@ def get_event(event_id: int, db: Session = Depends(get_db)):
         "name": event.name,
         "attendance": event.attendance,
         "revenue": event.revenue,
-        "feedback_count": len(event.feedbacks),
-        "has_score": event.score is not None,
+        "feedback_count": event.feedback_count,
+        "has_score": event.has_score,
         "created_at": event.created_at.isoformat() if event.created_at else None
     }
 
 
 @app.delete("/api/events/{event_id}")
-def delete_event(event_id: int, db: Session = Depends(get_db)):
+def delete_event(event_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_write_db)):
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
+    if remove_label(db, event_id):
+        background_tasks.add_task(retrain_in_background)
+    record_scores(db, {event_id: None})
     db.delete(event)
     db.commit()
+    get_feature_store().delete([event_id])
+    _revenue_benchmark_changed(db, background_tasks)
+    invalidate(score_scope(event_id), HISTORY, MODEL, ANALYTICS)
     return {"message": "Event deleted"}
 
 
 @app.get("/api/events/{event_id}/respondents")
-def get_respondents(event_id: int, db: Session = Depends(get_db)):
+def get_respondents(event_id: int, db: Session = Depends(get_write_db)):
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    existing = db.query(Feedback).filter(Feedback.event_id == event_id).all()
-    existing_ids = {f.respondent_id for f in existing}
-    
-    if len(existing_ids) >= 30:
-        return {"respondents": list(existing_ids), "remaining": 0}
-    
-    needed = 30 - len(existing_ids)
-    new_ids = set()
-    while len(new_ids) < needed:
-        rid = generate_respondent_id()
-        if rid not in existing_ids and rid not in new_ids:
-            new_ids.add(rid)
-    
-    all_ids = list(existing_ids) + list(new_ids)
-    return {"respondents": all_ids, "submitted": len(existing_ids), "remaining": 30 - len(existing_ids)}
+    ensure_tokens(db, event_id)
+    db.commit()
+    return {"respondents": list_tokens(db, event_id), **token_counts(db, event_id)}
 
 
 @app.get("/api/events/{event_id}/feedbacks", response_model=List[FeedbackResponse])
-def get_feedbacks(event_id: int, db: Session = Depends(get_db)):
-    feedbacks = db.query(Feedback).filter(Feedback.event_id == event_id).all()
-    return [
-        FeedbackResponse(id=f.id, respondent_id=f.respondent_id, text=f.text, rating=f.rating)
-        for f in feedbacks
-    ]
+def get_feedbacks(
+    event_id: int,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    feedbacks = db.query(
+        Feedback.id, Feedback.respondent_id, Feedback.text, Feedback.rating, Feedback.created_at
+    ).filter(Feedback.event_id == event_id)
+    return paginate(
+        request, response, feedbacks, Feedback.created_at, Feedback.id,
+        lambda f: FeedbackResponse(id=f.id, respondent_id=f.respondent_id, text=f.text, rating=f.rating),
+        cursor=cursor, limit=limit
+    )
 
 
-@app.post("/api/events/{event_id}/feedbacks")
-def submit_feedback(event_id: int, respondent_id: str, feedback: FeedbackCreate, db: Session = Depends(get_db)):
+def _store_feedback(db: Session, event_id: int, respondent_id: str, feedback: FeedbackCreate) -> dict:
+    analyses = analyze_feedbacks([feedback.text])
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    existing = db.query(Feedback).filter(
-        Feedback.event_id == event_id, 
-        Feedback.respondent_id == respondent_id
-    ).first()
-    if existing:
+    ensure_tokens(db, event_id)
+    if not consume_token(db, event_id, respondent_id):
+        detail = "Feedback already submitted for this respondent" if token_exists(db, event_id, respondent_id) else "Unknown respondent ID"
+        db.commit()
+        raise HTTPException(status_code=400, detail=detail)
+    
+    with timer("db.store_feedbacks"):
+        aggregate = store_feedbacks(db, event_id, [{"respondent_id": respondent_id, "text": feedback.text, "rating": feedback.rating}], analyses)
+    remaining = token_counts(db, event_id)["remaining"]
+    try:
+        with timer("db.commit"):
+            db.commit()
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(status_code=400, detail="Feedback already submitted for this respondent")
+    invalidate(score_scope(event_id))
     
-    db_feedback = Feedback(
-        event_id=event_id,
-        respondent_id=respondent_id,
-        text=feedback.text,
-        rating=feedback.rating
-    )
-    db.add(db_feedback)
+    return {"message": "Feedback submitted", "total_feedbacks": aggregate["feedback_count"], "remaining": remaining}
+
+
+@app.post("/api/events/{event_id}/feedbacks")
+async def submit_feedback(event_id: int, respondent_id: str, feedback: FeedbackCreate, db: Session = Depends(get_write_db)):
+    if FEEDBACK_WRITE_MODE == "group":
+        return await asyncio.wrap_future(feedback_queue.submit(event_id, respondent_id, feedback.text, feedback.rating))
+    return await run_in_threadpool(_store_feedback, db, event_id, respondent_id, feedback)
+
+
+def _ingest_feedback_rows(db: Session, event_id: int, file: BinaryIO, upload_format: str) -> dict:
+    errors = []
+    candidates = []
+    for row_number, row, error in iter_rows(file, upload_format):
+        if error:
+            errors.append({"row": row_number, "error": error})
+            continue
+        rating = row.get("rating")
+        try:
+            feedback = FeedbackCreate(text=row.get("text") or "", rating=None if rating in ("", None) else rating)
+        except ValidationError as exc:
+            detail = "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in exc.errors())
+            errors.append({"row": row_number, "error": detail})
+            continue
+        respondent_id = str(row.get("respondent_id") or "").strip() or None
+        candidates.append((row_number, respondent_id, feedback))
+    
+    # Sentiment is CPU-bound; run it before the first query checks out the single writer connection
+    analyses = analyze_feedbacks([feedback.text for _, _, feedback in candidates])
+    
+    event = db.query(Event.id).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    ensure_tokens(db, event_id)
+    requested = {respondent_id for _, respondent_id, _ in candidates if respondent_id}
+    known = known_tokens(db, event_id, requested)
+    claimed = consume_tokens(db, event_id, known)
+    unassigned = unused_tokens(db, event_id, sum(1 for _, respondent_id, _ in candidates if respondent_id is None))
+    assigned = consume_tokens(db, event_id, unassigned)
+    free = iter([token for token in unassigned if token in assigned])
+    items = []
+    kept = []
+    for (row_number, respondent_id, feedback), analysis in zip(candidates, analyses):
+        if respondent_id is None:
+            respondent_id = next(free, None)
+            if respondent_id is None:
+                errors.append({"row": row_number, "error": "No respondent IDs remaining for this event"})
+                continue
+        elif respondent_id not in known:
+            errors.append({"row": row_number, "respondent_id": respondent_id, "error": "Unknown respondent ID"})
+            continue
+        elif respondent_id not in claimed:
+            errors.append({"row": row_number, "respondent_id": respondent_id, "error": "Feedback already submitted for this respondent"})
+            continue
+        claimed.discard(respondent_id)
+        items.append({"respondent_id": respondent_id, "text": feedback.text, "rating": feedback.rating})
+        kept.append(analysis)
+    
+    aggregate = store_feedbacks(db, event_id, items, kept)
     db.commit()
+    invalidate(score_scope(event_id))
     
-    count = db.query(Feedback).filter(Feedback.event_id == event_id).count()
-    return {"message": "Feedback submitted", "total_feedbacks": count, "remaining": max(0, 30 - count)}
+    return {
+        "message": f"{len(items)} feedbacks submitted",
+        "inserted": len(items),
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "total_feedbacks": aggregate["feedback_count"],
+        "remaining": token_counts(db, event_id)["remaining"]
+    }
+
+
+@app.post("/api/events/{event_id}/feedbacks:bulk")
+async def bulk_submit_feedback(event_id: int, request: Request, db: Session = Depends(get_write_db)):
+    file, upload_format = await read_upload(request)
+    return await run_in_threadpool(_ingest_feedback_rows, db, event_id, file, upload_format)
 
 
 @app.post("/api/events/{event_id}/compute-score", response_model=ScoreResponse)
-def compute_score(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(Event).filter(Event.id == event_id).first()
+def compute_score(event_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_write_db)):
+    with timer("db.load_event"):
+        event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    feedbacks = db.query(Feedback).filter(Feedback.event_id == event_id).all()
-    if len(feedbacks) < 30:
-        raise HTTPException(status_code=400, detail=f"Need 30 feedbacks, only have {len(feedbacks)}")
+    with timer("db.load_aggregate"):
+        aggregate = load_aggregate(db, event_id)
+    if aggregate["feedback_count"] < 30:
+        raise HTTPException(status_code=400, detail=f"Need 30 feedbacks, only have {aggregate['feedback_count']}")
     
-    model_state = db.query(ModelState).first()
-    model_weights = model_state.weights if model_state and model_state.trained_on_n >= 5 else None
+    with timer("db.active_model"):
+        model_version, model = get_active_model(db)
     
-    feedback_dicts = [{"text": f.text, "rating": f.rating} for f in feedbacks]
-    feedback_score, features, feedback_explanation = compute_feedback_score(feedback_dicts, model_weights)
+    feedback_score, features, feedback_explanation = compute_aggregate_score(aggregate, model)
     
-    past_events = db.query(Event).filter(Event.id != event_id).all()
-    past_data = [{"revenue": e.revenue, "attendance": e.attendance} for e in past_events]
-    revenue_score, revenue_explanation = compute_revenue_score(event.revenue, event.attendance, past_data)
+    with timer("db.revenue_index"):
+        past_events = get_revenue_index(db).excluding(event.revenue_per_attendee)
+    revenue_score, revenue_explanation = compute_revenue_score(event.revenue, event.attendance, past_events)
+    benchmark = revenue_benchmark(past_events)
     
     value_score = compute_value_score(feedback_score, revenue_score)
     
     explanation = {
         "feedback": feedback_explanation,
         "revenue": revenue_explanation,
-        "weights": {"feedback": 0.50, "revenue": 0.50}
+        "weights": dict(VALUE_WEIGHTS)
     }
     
-    existing_score = db.query(Score).filter(Score.event_id == event_id).first()
+    with timer("db.analytics"):
+        record_scores(db, {event_id: score_metrics(revenue_score, feedback_score, value_score, features)})
+    with timer("db.load_score"):
+        existing_score = db.query(Score).filter(Score.event_id == event_id).first()
     if existing_score:
         existing_score.revenue_score = revenue_score
         existing_score.feedback_score = feedback_score
         existing_score.value_score = value_score
         existing_score.explanation = explanation
         existing_score.feature_vector = features
+        existing_score.model_version = model_version
+        existing_score.benchmark_min = benchmark["benchmark_min"]
+        existing_score.benchmark_max = benchmark["benchmark_max"]
+        existing_score.benchmark_n = benchmark["benchmark_n"]
+        existing_score.revenue_stale = False
     else:
         db_score = Score(
             event_id=event_id,
@@ -239,11 +487,21 @@ def compute_score(event_id: int, db: Session = Depends(get_db)):
             feedback_score=feedback_score,
             value_score=value_score,
             explanation=explanation,
-            feature_vector=features
+            feature_vector=features,
+            model_version=model_version,
+            revenue_stale=False,
+            **benchmark
         )
         db.add(db_score)
     
-    db.commit()
+    with timer("db.sync_label"):
+        if sync_label_features(db, event_id, features):
+            background_tasks.add_task(retrain_in_background)
+    with timer("db.commit"):
+        db.commit()
+    with timer("feature_store.put"):
+        get_feature_store().put_features({event_id: features})
+    invalidate(score_scope(event_id), HISTORY, ANALYTICS)
     
     return ScoreResponse(
         event_id=event_id,
@@ -255,8 +513,7 @@ def compute_score(event_id: int, db: Session = Depends(get_db)):
     )
 
 
-@app.get("/api/events/{event_id}/score", response_model=ScoreResponse)
-def get_score(event_id: int, db: Session = Depends(get_db)):
+def _score_response(event_id: int, db: Session) -> ScoreResponse:
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -264,6 +521,10 @@ def get_score(event_id: int, db: Session = Depends(get_db)):
     score = db.query(Score).filter(Score.event_id == event_id).first()
     if not score:
         raise HTTPException(status_code=404, detail="Score not computed yet")
+    if score.revenue_stale:
+        with timer("db.refresh_revenue"):
+            _refresh_stale_revenue(db, [event_id])
+        score = db.query(Score).filter(Score.event_id == event_id).first()
     
     return ScoreResponse(
         event_id=event_id,
@@ -275,8 +536,13 @@ def get_score(event_id: int, db: Session = Depends(get_db)):
     )
 
 
+@app.get("/api/events/{event_id}/score", response_model=ScoreResponse)
+def get_score(event_id: int, request: Request, db: Session = Depends(get_db)):
+    return cached_response(request, "score", [score_scope(event_id)], lambda _: _score_response(event_id, db), (event_id,))
+
+
 @app.post("/api/events/{event_id}/calibrate")
-def submit_calibration(event_id: int, label: TrainingLabelCreate, db: Session = Depends(get_db)):
+def submit_calibration(event_id: int, label: TrainingLabelCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_write_db)):
     event = db.query(Event).filter(Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -285,63 +551,182 @@ def submit_calibration(event_id: int, label: TrainingLabelCreate, db: Session =
     if not score:
         raise HTTPException(status_code=400, detail="Compute score first before calibrating")
     
-    existing = db.query(TrainingLabel).filter(TrainingLabel.event_id == event_id).first()
-    if existing:
-        existing.admin_label = label.admin_label
-    else:
-        db_label = TrainingLabel(event_id=event_id, admin_label=label.admin_label)
-        db.add(db_label)
-    
+    stats = record_label(db, event_id, label.admin_label, score.feature_vector or {})
     db.commit()
+    invalidate(MODEL)
     
-    labeled_events = db.query(TrainingLabel).join(Score, TrainingLabel.event_id == Score.event_id).all()
+    if stats["n"] >= 5:
+        background_tasks.add_task(retrain_in_background)
+        return {"message": "Calibration saved, model retraining in background", "trained_on": stats["n"]}
     
-    if len(labeled_events) >= 5:
-        training_data = []
-        for tl in labeled_events:
-            score = db.query(Score).filter(Score.event_id == tl.event_id).first()
-            if score and score.feature_vector:
-                training_data.append({
-                    "features": score.feature_vector,
-                    "label": tl.admin_label
-                })
-        
-        if len(training_data) >= 5:
-            weights = train_model(training_data)
-            if weights:
-                model_state = db.query(ModelState).first()
-                if model_state:
-                    model_state.weights = weights
-                    model_state.trained_on_n = len(training_data)
-                    model_state.version += 1
-                else:
-                    db.add(ModelState(weights=weights, trained_on_n=len(training_data)))
-                db.commit()
-                return {"message": "Calibration saved and model retrained", "trained_on": len(training_data)}
-    
-    return {"message": "Calibration saved", "total_labels": len(labeled_events), "need_for_training": max(0, 5 - len(labeled_events))}
+    return {"message": "Calibration saved", "total_labels": stats["n"], "need_for_training": max(0, 5 - stats["n"])}
+
+
+@app.post("/api/admin/rescore")
+def rescore(
+    background_tasks: BackgroundTasks,
+    only_stale: bool = False,
+    chunk_size: int = 200,
+    workers: Optional[int] = Query(None, ge=1, le=RESCORE_MAX_WORKERS),
+    db: Session = Depends(get_write_db)
+):
+    report = rescore_events(db, chunk_size=chunk_size, workers=workers, only_stale=only_stale)
+    invalidate_all()
+    if report["labels_changed"]:
+        background_tasks.add_task(retrain_in_background)
+    return {"message": "Scores recomputed", **report}
 
 
 @app.get("/api/history", response_model=List[HistoryItem])
-def get_history(db: Session = Depends(get_db)):
-    events_with_scores = db.query(Event).join(Score).order_by(Event.created_at.desc()).all()
+def get_history(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    def build(scratch):
+        if db.query(Score.id).filter(Score.revenue_stale.is_(True)).first():
+            with timer("db.refresh_revenue"):
+                _refresh_stale_revenue(db)
+        return paginate(
+            request, scratch, _history_query(db), Event.created_at, Event.id, _history_item,
+            cursor=cursor, limit=limit, descending=True
+        )
+    if NDJSON in request.headers.get("accept", ""):
+        return build(response)
+    return cached_response(request, "history", [HISTORY], build, (cursor, limit))
+
+
+def _history_query(db: Session):
+    return (
+        db.query(
+            Event.id,
+            Event.name,
+            Event.attendance,
+            Event.revenue,
+            Event.created_at,
+            Score.revenue_score,
+            Score.feedback_score,
+            Score.value_score
+        )
+        .join(Score, Score.event_id == Event.id)
+    )
+
+
+def _history_item(e) -> HistoryItem:
+    return HistoryItem(
+        id=e.id,
+        name=e.name,
+        attendance=e.attendance,
+        revenue=e.revenue,
+        revenue_score=round(e.revenue_score, 1),
+        feedback_score=round(e.feedback_score, 1),
+        value_score=round(e.value_score, 1),
+        created_at=e.created_at.isoformat() if e.created_at else ""
+    )
+
+
+@app.get("/api/search", response_model=List[SearchResult])
+def search(
+    response: Response,
+    q: Optional[str] = None,
+    category: List[str] = Query([]),
+    event_id: List[int] = Query([]),
+    match: str = Query("all", pattern="^(all|any)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    if not search_index_available():
+        raise HTTPException(status_code=501, detail="Full-text search requires SQLite FTS5")
+    with timer("db.search"):
+        rows, next_cursor = search_feedbacks(db, q, category, event_id, match, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [
-        HistoryItem(
-            id=e.id,
-            name=e.name,
-            attendance=e.attendance,
-            revenue=e.revenue,
-            revenue_score=round(e.score.revenue_score, 1),
-            feedback_score=round(e.score.feedback_score, 1),
-            value_score=round(e.score.value_score, 1),
-            created_at=e.created_at.isoformat() if e.created_at else ""
+        SearchResult(
+            id=r["id"],
+            event_id=r["event_id"],
+            event_name=r["event_name"],
+            respondent_id=r["respondent_id"],
+            text=r["text"],
+            rating=r["rating"],
+            snippet=r["snippet"],
+            score=round(-r["rank"], 4)
         )
-        for e in events_with_scores
+        for r in rows
     ]
 
 
+@app.get("/api/analytics/trends", response_model=TrendsResponse)
+def get_trends(
+    request: Request,
+    granularity: str = Query("month", pattern="^(month|term)$"),
+    metric: List[str] = Query([]),
+    periods: Optional[int] = Query(None, ge=1, le=240),
+    db: Session = Depends(get_db)
+):
+    unknown = [m for m in metric if m not in METRIC_RANGES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metric '{unknown[0]}', expected one of {', '.join(METRIC_RANGES)}")
+    build = lambda scratch: TrendsResponse(granularity=granularity, periods=trends(db, granularity, metric, periods))
+    return cached_response(request, "trends", [ANALYTICS], build, (granularity, tuple(metric), periods))
+
+
+@app.post("/api/simulate", response_model=SimulateResponse)
+def simulate(payload: SimulateRequest, request: Request, db: Session = Depends(get_db)):
+    if payload.feedback_weight + payload.revenue_weight <= 0:
+        raise HTTPException(status_code=400, detail="At least one of feedback_weight and revenue_weight must be positive")
+    
+    def build(_):
+        if db.query(Score.id).filter(Score.revenue_stale.is_(True)).first():
+            with timer("db.refresh_revenue"):
+                _refresh_stale_revenue(db)
+        rubric = payload.rubric.model_dump() if payload.rubric else None
+        with timer("db.simulate"):
+            result = simulate_rankings(db, {"feedback": payload.feedback_weight, "revenue": payload.revenue_weight}, rubric)
+        
+        # Positive rank_change means the event moved up
+        changes = result["current_ranks"] - result["ranks"]
+        if payload.order == "change":
+            order = np.lexsort((result["ranks"], -np.abs(changes)))
+        else:
+            order = np.argsort(result["ranks"])
+        order = order[:payload.limit]
+        event_ids = result["event_ids"][order].tolist()
+        names = dict(db.query(Event.id, Event.name).filter(Event.id.in_(event_ids)))
+        return SimulateResponse(
+            events=len(result["event_ids"]),
+            moved=int(np.count_nonzero(changes)),
+            weights={key: round(value, 4) for key, value in result["weights"].items()},
+            feedback="rubric" if rubric is not None else "stored",
+            rescored=result["rescored"],
+            rank_correlation=None if result["rank_correlation"] is None else round(result["rank_correlation"], 4),
+            results=[
+                SimulatedEvent(
+                    event_id=event_id,
+                    name=names.get(event_id, ""),
+                    feedback_score=round(float(result["feedback_scores"][i]), 1),
+                    revenue_score=round(float(result["revenue_scores"][i]), 1),
+                    current_value_score=round(float(result["current_values"][i]), 1),
+                    value_score=round(float(result["values"][i]), 1),
+                    current_rank=int(result["current_ranks"][i]),
+                    rank=int(result["ranks"][i]),
+                    rank_change=int(changes[i])
+                )
+                for event_id, i in zip(event_ids, order.tolist())
+            ]
+        )
+    return cached_response(request, "simulate", [HISTORY], build, (payload.model_dump_json(),))
+
+
 @app.get("/api/model-status")
-def get_model_status(db: Session = Depends(get_db)):
+def get_model_status(request: Request, db: Session = Depends(get_db)):
+    return cached_response(request, "model-status", [MODEL], lambda _: _model_status(db))
+
+
+def _model_status(db: Session) -> dict:
     model_state = db.query(ModelState).first()
     label_count = db.query(TrainingLabel).count()
     
@@ -363,15 +748,18 @@ def get_model_status(db: Session = Depends(get_db)):
 
 
 @app.post("/api/seed-demo")
-def seed_demo(db: Session = Depends(get_db)):
+def seed_demo(background_tasks: BackgroundTasks, db: Session = Depends(get_write_db)):
     existing = db.query(Event).filter(Event.name == "PSA Welcome Week 2024").first()
     if existing:
         return {"message": "Demo already exists", "event_id": existing.id}
     
-    event = Event(name="PSA Welcome Week 2024", attendance=150, revenue=2250.0)
+    event = Event(name="PSA Welcome Week 2024", attendance=150, revenue=2250.0, revenue_per_attendee=2250.0 / 150)
     db.add(event)
+    db.flush()
+    issue_tokens(db, event.id, consumed=[f"R-DEMO{str(i+1).zfill(2)}" for i in range(30)])
     db.commit()
     db.refresh(event)
+    _revenue_benchmark_changed(db, background_tasks)
     
     sample_feedbacks = [
         ("The event was amazing! Loved the cultural performances and the food was delicious.", 5),
@@ -406,15 +794,15 @@ def seed_demo(db: Session = Depends(get_db)):
         ("One of the best campus events I've attended. Well done PSA!", 5),
     ]
     
-    for i, (text, rating) in enumerate(sample_feedbacks):
-        fb = Feedback(
-            event_id=event.id,
-            respondent_id=f"R-DEMO{str(i+1).zfill(2)}",
-            text=text,
-            rating=rating
-        )
-        db.add(fb)
-    
+    store_feedbacks(db, event.id, [
+        {"respondent_id": f"R-DEMO{str(i+1).zfill(2)}", "text": text, "rating": rating}
+        for i, (text, rating) in enumerate(sample_feedbacks)
+    ])
     db.commit()
     
     return {"message": "Demo event created with 30 feedbacks", "event_id": event.id}
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,32 @@
+import threading
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+
+from models import ModelState
+from scoring import LinearModel
+
+_lock = threading.Lock()
+_cached: Optional[LinearModel] = None
+
+
+def get_active_model(db: Session) -> Tuple[Optional[int], Optional[LinearModel]]:
+    global _cached
+    state = db.query(ModelState.id, ModelState.version, ModelState.trained_on_n).first()
+    if state is None:
+        return None, None
+    if state.trained_on_n < 5:
+        return state.version, None
+
+    model = _cached
+    if model is None or model.version != state.version:
+        weights = db.query(ModelState.weights).filter(ModelState.id == state.id).scalar()
+        model = LinearModel.from_weights(weights, state.version)
+        with _lock:
+            _cached = model
+    return state.version, model
+
+
+def invalidate_model_cache():
+    global _cached
+    with _lock:
+        _cached = None
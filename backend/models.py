@@ -1,8 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Text, JSON, Index, UniqueConstraint
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
 
+# Matches SQLite's CURRENT_TIMESTAMP so keyset comparisons against server defaults line up
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
 class Event(Base):
     __tablename__ = "events"
     
@@ -10,24 +17,47 @@ class Event(Base):
     name = Column(String, index=True)
     attendance = Column(Integer)
     revenue = Column(Float)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    revenue_per_attendee = Column(Float, index=True)
+    created_at = Column(Timestamp, server_default=func.now())
     
     feedbacks = relationship("Feedback", back_populates="event", cascade="all, delete-orphan")
     score = relationship("Score", back_populates="event", uselist=False, cascade="all, delete-orphan")
     training_label = relationship("TrainingLabel", back_populates="event", uselist=False, cascade="all, delete-orphan")
+    feature_aggregate = relationship("EventFeatureAggregate", back_populates="event", uselist=False, cascade="all, delete-orphan")
+    respondent_tokens = relationship("RespondentToken", back_populates="event", cascade="all, delete-orphan")
 
 class Feedback(Base):
     __tablename__ = "feedbacks"
+    __table_args__ = (
+        Index("ux_feedbacks_event_respondent", "event_id", "respondent_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    event_id = Column(Integer, ForeignKey("events.id"))
+    event_id = Column(Integer, ForeignKey("events.id"), index=True)
     respondent_id = Column(String)
     text = Column(Text)
     rating = Column(Integer, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    polarity = Column(Float, nullable=True)
+    keyword_hits = Column(JSON, nullable=True)
+    created_at = Column(Timestamp, server_default=func.now())
     
     event = relationship("Event", back_populates="feedbacks")
 
+class RespondentToken(Base):
+    __tablename__ = "respondent_tokens"
+    __table_args__ = (
+        UniqueConstraint("event_id", "token", name="uq_respondent_tokens_event_token"),
+        Index("ix_respondent_tokens_event_consumed", "event_id", "consumed"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    token = Column(String, nullable=False)
+    consumed = Column(Boolean, nullable=False, default=False)
+    consumed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    event = relationship("Event", back_populates="respondent_tokens")
+
 class Score(Base):
     __tablename__ = "scores"
     
@@ -38,20 +68,56 @@ class Score(Base):
     value_score = Column(Float)
     explanation = Column(JSON)
     feature_vector = Column(JSON)
+    model_version = Column(Integer, nullable=True)
+    benchmark_min = Column(Float, nullable=True)
+    benchmark_max = Column(Float, nullable=True)
+    benchmark_n = Column(Integer, nullable=True)
+    revenue_stale = Column(Boolean, default=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     event = relationship("Event", back_populates="score")
 
+class EventFeatureAggregate(Base):
+    __tablename__ = "event_feature_aggregates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, ForeignKey("events.id"), unique=True)
+    feedback_count = Column(Integer, default=0)
+    polarity_sum = Column(Float, default=0.0)
+    rating_sum = Column(Integer, default=0)
+    rating_count = Column(Integer, default=0)
+    category_hits = Column(JSON)
+    positive_hits = Column(JSON)
+    negative_hits = Column(JSON)
+    strong_positive_hits = Column(JSON)
+    strong_negative_hits = Column(JSON)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    event = relationship("Event", back_populates="feature_aggregate")
+
 class TrainingLabel(Base):
     __tablename__ = "training_labels"
     
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id"), unique=True)
     admin_label = Column(Float)
+    feature_vector = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     event = relationship("Event", back_populates="training_label")
 
+class TrainingStats(Base):
+    __tablename__ = "training_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    feature_order = Column(JSON)
+    n = Column(Integer, default=0)
+    xtx = Column(JSON)
+    xty = Column(JSON)
+    x_sum = Column(JSON)
+    y_sum = Column(Float, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class ModelState(Base):
     __tablename__ = "model_state"
     
@@ -60,3 +126,25 @@ class ModelState(Base):
     weights = Column(JSON)
     trained_on_n = Column(Integer, default=0)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class AnalyticsRollup(Base):
+    __tablename__ = "analytics_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "period", "metric", name="uq_analytics_rollups_bucket"),
+        Index("ix_analytics_rollups_granularity_start", "granularity", "period_start"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String)
+    period = Column(String)
+    period_start = Column(Date)
+    metric = Column(String)
+    count = Column(Integer, default=0)
+    total = Column(Float, default=0.0)
+    histogram = Column(JSON)
+    mean = Column(Float, nullable=True)
+    p25 = Column(Float, nullable=True)
+    p50 = Column(Float, nullable=True)
+    p75 = Column(Float, nullable=True)
+    p90 = Column(Float, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
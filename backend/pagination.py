@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+from database import ReadSessionLocal
+
+NDJSON = "application/x-ndjson"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    payload = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(query: Query, created_col, id_col, cursor: Optional[str], descending: bool = False) -> Query:
+    if descending:
+        query = query.order_by(created_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(created_col, id_col)
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(or_(created_col < created_at, and_(created_col == created_at, id_col < row_id)))
+        else:
+            query = query.filter(or_(created_col > created_at, and_(created_col == created_at, id_col > row_id)))
+    return query
+
+
+def _stream(query: Query, serialize: Callable[[object], BaseModel]):
+    db = ReadSessionLocal()
+    try:
+        for row in query.with_session(db).yield_per(500):
+            yield serialize(row).model_dump_json() + "\n"
+    finally:
+        db.close()
+
+
+def paginate(
+    request: Request,
+    response: Response,
+    query: Query,
+    created_col,
+    id_col,
+    serialize: Callable[[object], BaseModel],
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    descending: bool = False
+):
+    query = keyset(query, created_col, id_col, cursor, descending)
+
+    if NDJSON in request.headers.get("accept", ""):
+        if limit is not None:
+            query = query.limit(limit)
+        return StreamingResponse(_stream(query, serialize), media_type=NDJSON)
+
+    if limit is None:
+        return [serialize(row) for row in query]
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [serialize(row) for row in rows]
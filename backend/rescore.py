@@ -0,0 +1,170 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from aggregates import aggregate_to_dict, feedback_to_dict, save_aggregate
+from analytics import record_scores, score_metrics
+from feature_store import get_feature_store
+from model_cache import get_active_model
+from models import Event, EventFeatureAggregate, Feedback, Score, TrainingLabel
+from revenue import load_revenue_index
+from training import sync_label_features
+from scoring import LinearModel, RevenueIndex, aggregate_feedbacks, score_events
+
+# Chunks are cheap to score from stored aggregates, so pickling them to a process pool only pays off on
+# large tables whose feedback still has to be re-analyzed (rows without stored polarity, TextBlob backend)
+RESCORE_PARALLEL_MIN_EVENTS = int(os.getenv("RESCORE_PARALLEL_MIN_EVENTS", "5000"))
+RESCORE_MAX_WORKERS = int(os.getenv("RESCORE_MAX_WORKERS", "2"))
+
+SCORE_COLUMNS = [
+    "revenue_score", "feedback_score", "value_score", "explanation", "feature_vector", "model_version",
+    "benchmark_min", "benchmark_max", "benchmark_n", "revenue_stale"
+]
+
+
+def _score_chunk(items: List[Dict], model: Optional[LinearModel], revenue_index: RevenueIndex) -> List[Tuple]:
+    rebuilt = {}
+    for item in items:
+        if item["aggregate"] is None:
+            item["aggregate"] = rebuilt[item["event_id"]] = aggregate_feedbacks(item.pop("feedbacks"))
+    scores, explanations = score_events(items, model, revenue_index)
+    return [
+        (int(row["event_id"]), row, explanation, rebuilt.get(int(row["event_id"])))
+        for row, explanation in zip(scores, explanations)
+    ]
+
+
+def _load_chunk(db: Session, event_ids: List[int], events: Dict) -> List[Dict]:
+    rows = db.query(EventFeatureAggregate).filter(EventFeatureAggregate.event_id.in_(event_ids)).all()
+    aggregates = {row.event_id: aggregate_to_dict(row) for row in rows}
+
+    missing = [event_id for event_id in event_ids if event_id not in aggregates]
+    feedbacks: Dict[int, List[Dict]] = {event_id: [] for event_id in missing}
+    if missing:
+        for f in db.query(Feedback).filter(Feedback.event_id.in_(missing)).order_by(Feedback.id):
+            feedbacks[f.event_id].append(feedback_to_dict(f))
+
+    return [
+        {
+            "event_id": event_id,
+            "revenue": events[event_id].revenue,
+            "attendance": events[event_id].attendance,
+            "aggregate": aggregates.get(event_id),
+            "feedbacks": feedbacks.get(event_id)
+        }
+        for event_id in event_ids
+    ]
+
+
+def upsert_scores(db: Session, rows: List[Dict]):
+    if not rows:
+        return
+    record_scores(db, {
+        r["event_id"]: score_metrics(r["revenue_score"], r["feedback_score"], r["value_score"], r["feature_vector"])
+        for r in rows
+    })
+    get_feature_store().put_features({r["event_id"]: r["feature_vector"] for r in rows if r["feature_vector"]})
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(Score).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Score.event_id],
+            set_={column: stmt.excluded[column] for column in SCORE_COLUMNS}
+        )
+        db.execute(stmt)
+        return
+
+    existing = dict(db.query(Score.event_id, Score.id).filter(Score.event_id.in_([r["event_id"] for r in rows])))
+    updates = [{"id": existing[r["event_id"]], **r} for r in rows if r["event_id"] in existing]
+    if updates:
+        db.execute(update(Score), updates)
+    db.add_all(Score(**r) for r in rows if r["event_id"] not in existing)
+
+
+def rescore_events(
+    db: Session,
+    chunk_size: int = 200,
+    workers: Optional[int] = None,
+    only_stale: bool = False,
+    progress: Optional[Callable[[Dict], None]] = None
+) -> Dict:
+    started = time.perf_counter()
+
+    model_version, model = get_active_model(db)
+
+    query = db.query(Score.event_id).order_by(Score.event_id)
+    if only_stale:
+        query = query.filter((Score.model_version.is_(None)) | (Score.model_version != model_version))
+    event_ids = [event_id for (event_id,) in query]
+
+    events = {e.id: e for e in db.query(Event.id, Event.revenue, Event.attendance)}
+    revenue_index = load_revenue_index(db)
+    labeled = {event_id for (event_id,) in db.query(TrainingLabel.event_id)}
+    labels_changed = 0
+
+    chunks = [event_ids[i:i + chunk_size] for i in range(0, len(event_ids), chunk_size)]
+    if workers is None:
+        workers = min(os.cpu_count() or 1, RESCORE_MAX_WORKERS) if len(event_ids) >= RESCORE_PARALLEL_MIN_EVENTS else 1
+    # spawn, not fork: forking the threaded API process can copy a lock (the metrics registry's, held around
+    # every query) in its locked state, and the child then blocks on it forever
+    executor = (
+        ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        if workers > 1 and len(chunks) > 1 else None
+    )
+
+    done = 0
+    try:
+        if executor:
+            pending = [executor.submit(_score_chunk, _load_chunk(db, chunk, events), model, revenue_index) for chunk in chunks]
+            results = (future.result() for future in pending)
+        else:
+            results = (_score_chunk(_load_chunk(db, chunk, events), model, revenue_index) for chunk in chunks)
+
+        for chunk_results in results:
+            rows = []
+            for event_id, score, explanation, rebuilt in chunk_results:
+                rows.append({
+                    "event_id": event_id,
+                    "revenue_score": float(score["revenue_score"]),
+                    "feedback_score": float(score["feedback_score"]),
+                    "value_score": float(score["value_score"]),
+                    "feature_vector": explanation.pop("features"),
+                    "explanation": explanation,
+                    "model_version": model_version,
+                    "benchmark_min": float(score["benchmark_min"]),
+                    "benchmark_max": float(score["benchmark_max"]),
+                    "benchmark_n": int(score["benchmark_n"]),
+                    "revenue_stale": False
+                })
+                if rebuilt is not None:
+                    save_aggregate(db, event_id, rebuilt)
+            upsert_scores(db, rows)
+            for row in rows:
+                if row["event_id"] in labeled and sync_label_features(db, row["event_id"], row["feature_vector"]):
+                    labels_changed += 1
+            db.commit()
+
+            done += len(rows)
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress({"done": done, "total": len(event_ids), "events_per_sec": done / elapsed if elapsed else 0.0})
+    finally:
+        if executor:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "model_version": model_version,
+        "method": "learned" if model else "rubric",
+        "events": done,
+        "labels_changed": labels_changed,
+        "seconds": round(elapsed, 3),
+        "events_per_sec": round(done / elapsed, 1) if elapsed else 0.0
+    }
@@ -0,0 +1,116 @@
+import random
+import string
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Set
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+
+from models import Feedback, RespondentToken
+
+RESPONSES_PER_EVENT = 30
+
+
+def generate_respondent_id() -> str:
+    return "R-" + "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
+
+
+def issue_tokens(db: Session, event_id: int, count: int = RESPONSES_PER_EVENT, consumed: Iterable[str] = ()):
+    consumed = list(dict.fromkeys(consumed))
+    fresh: Set[str] = set()
+    while len(fresh) < count - len(consumed):
+        token = generate_respondent_id()
+        if token not in consumed:
+            fresh.add(token)
+
+    now = datetime.now(timezone.utc)
+    rows = [{"event_id": event_id, "token": t, "consumed": True, "consumed_at": now} for t in consumed]
+    rows += [{"event_id": event_id, "token": t, "consumed": False, "consumed_at": None} for t in sorted(fresh)]
+    if rows:
+        db.execute(insert(RespondentToken), rows)
+
+
+def ensure_tokens(db: Session, event_id: int):
+    if db.query(RespondentToken.id).filter(RespondentToken.event_id == event_id).first():
+        return
+    submitted = [rid for (rid,) in db.query(Feedback.respondent_id).filter(Feedback.event_id == event_id).order_by(Feedback.id)]
+    issue_tokens(db, event_id, max(RESPONSES_PER_EVENT, len(set(submitted))), consumed=submitted)
+
+
+def token_counts(db: Session, event_id: int) -> Dict[str, int]:
+    counts = dict(
+        db.query(RespondentToken.consumed, func.count(RespondentToken.id))
+        .filter(RespondentToken.event_id == event_id)
+        .group_by(RespondentToken.consumed)
+    )
+    return {"submitted": counts.get(True, 0), "remaining": counts.get(False, 0)}
+
+
+def list_tokens(db: Session, event_id: int) -> List[str]:
+    tokens = (
+        db.query(RespondentToken.token)
+        .filter(RespondentToken.event_id == event_id)
+        .order_by(RespondentToken.consumed.desc(), RespondentToken.consumed_at, RespondentToken.id)
+    )
+    return [token for (token,) in tokens]
+
+
+def consume_tokens(db: Session, event_id: int, tokens: Iterable[str]) -> Set[str]:
+    tokens = set(tokens)
+    if not tokens:
+        return set()
+    available = {
+        token for (token,) in db.query(RespondentToken.token).filter(
+            RespondentToken.event_id == event_id,
+            RespondentToken.token.in_(tokens),
+            RespondentToken.consumed.is_(False)
+        )
+    }
+    if available:
+        db.execute(
+            update(RespondentToken)
+            .where(
+                RespondentToken.event_id == event_id,
+                RespondentToken.token.in_(available),
+                RespondentToken.consumed.is_(False)
+            )
+            .values(consumed=True, consumed_at=func.now())
+        )
+    return available
+
+
+def consume_token(db: Session, event_id: int, token: str) -> bool:
+    result = db.execute(
+        update(RespondentToken)
+        .where(
+            RespondentToken.event_id == event_id,
+            RespondentToken.token == token,
+            RespondentToken.consumed.is_(False)
+        )
+        .values(consumed=True, consumed_at=func.now())
+    )
+    return result.rowcount == 1
+
+
+def token_exists(db: Session, event_id: int, token: str) -> bool:
+    return db.query(RespondentToken.id).filter(RespondentToken.event_id == event_id, RespondentToken.token == token).first() is not None
+
+
+def known_tokens(db: Session, event_id: int, tokens: Iterable[str]) -> Set[str]:
+    tokens = set(tokens)
+    if not tokens:
+        return set()
+    return {
+        token for (token,) in db.query(RespondentToken.token).filter(
+            RespondentToken.event_id == event_id, RespondentToken.token.in_(tokens)
+        )
+    }
+
+
+def unused_tokens(db: Session, event_id: int, limit: int) -> List[str]:
+    tokens = (
+        db.query(RespondentToken.token)
+        .filter(RespondentToken.event_id == event_id, RespondentToken.consumed.is_(False))
+        .order_by(RespondentToken.id)
+        .limit(limit)
+    )
+    return [token for (token,) in tokens]
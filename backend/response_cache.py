@@ -0,0 +1,84 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic_core import to_json
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[Hashable, Tuple[float, bytes, str, Dict[str, str]]]" = OrderedDict()
+_versions: Dict[str, int] = {}
+_generation = 0
+
+
+def score_scope(event_id: int) -> str:
+    return f"score:{event_id}"
+
+
+HISTORY = "history"
+MODEL = "model"
+ANALYTICS = "analytics"
+
+
+def invalidate(*scopes: str):
+    with _lock:
+        for scope in scopes:
+            _versions[scope] = _versions.get(scope, 0) + 1
+
+
+def invalidate_all():
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def _respond(request: Request, body: bytes, etag: str, headers: Dict[str, str]) -> Response:
+    headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_response(
+    request: Request,
+    name: str,
+    scopes: Iterable[str],
+    build: Callable[[Response], object],
+    params: Tuple = ()
+) -> Response:
+    with _lock:
+        key = (name, params, _generation, tuple((scope, _versions.get(scope, 0)) for scope in scopes))
+        entry = _entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < RESPONSE_CACHE_TTL:
+            _entries.move_to_end(key)
+            _, body, etag, headers = entry
+            return _respond(request, body, etag, headers)
+
+    scratch = Response()
+    body = to_json(build(scratch))
+    headers = {k: v for k, v in scratch.headers.items() if k.lower() not in ("content-length", "content-type")}
+    etag = make_etag(body)
+    with _lock:
+        _entries[key] = (time.monotonic(), body, etag, headers)
+        _entries.move_to_end(key)
+        while len(_entries) > RESPONSE_CACHE_SIZE:
+            _entries.popitem(last=False)
+    return _respond(request, body, etag, headers)
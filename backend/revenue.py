@@ -0,0 +1,149 @@
+import threading
+from typing import List, Optional, Tuple
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from analytics import record_scores, score_metrics
+from database import SessionLocal
+from feature_store import load_features
+from models import Event, Score
+from response_cache import ANALYTICS, HISTORY, invalidate, score_scope
+from scoring import FEATURE_ORDER, REVENUE_BENCHMARK_MODE, REVENUE_TRIM, RevenueIndex, compute_value_score, np, score_revenues
+
+_revenue_index: Optional[RevenueIndex] = None
+_revenue_version: Optional[Tuple] = None
+_index_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+
+def backfill_revenue_per_attendee(db: Session) -> int:
+    updated = (
+        db.query(Event)
+        .filter(Event.revenue_per_attendee.is_(None), Event.attendance > 0)
+        .update({Event.revenue_per_attendee: Event.revenue * 1.0 / Event.attendance}, synchronize_session=False)
+    )
+    db.commit()
+    return updated
+
+
+def load_revenue_index(db: Session) -> RevenueIndex:
+    values = (
+        db.query(Event.revenue_per_attendee)
+        .filter(Event.revenue_per_attendee.isnot(None))
+        .order_by(Event.revenue_per_attendee)
+    )
+    return RevenueIndex(value for (value,) in values)
+
+
+def revenue_version(db: Session) -> Tuple:
+    # Changes whenever another worker or the CLI adds, deletes or backfills an event; max(id) and the total
+    # catch a delete followed by a create, which leaves the count unchanged. Answered from the column's index.
+    return tuple(db.query(
+        func.count(Event.revenue_per_attendee),
+        func.max(Event.id),
+        func.sum(Event.revenue_per_attendee)
+    ).one())
+
+
+def get_revenue_index(db: Session) -> RevenueIndex:
+    global _revenue_index, _revenue_version
+    version = revenue_version(db)
+    index = _revenue_index
+    if index is None or _revenue_version != version:
+        index = load_revenue_index(db)
+        with _index_lock:
+            _revenue_index, _revenue_version = index, version
+    return index
+
+
+def benchmark_key(index: RevenueIndex, mode: Optional[str] = None) -> Tuple:
+    # Everything a stored revenue score depends on besides the event's own revenue per attendee
+    mode = mode or REVENUE_BENCHMARK_MODE
+    n = len(index) - 1
+    if n < 3:
+        return ("default",)
+    if mode == "percentile":
+        return ("percentile", n)
+    return ("rolling",) + index.exclusion_bounds(REVENUE_TRIM if mode == "trimmed" else 0.0)
+
+
+def mark_stale_scores(db: Session) -> List[int]:
+    # Compares every score against the benchmark the committed events give now, so creates and deletes made by
+    # other workers or the CLI are caught too; call after committing the change
+    key = benchmark_key(get_revenue_index(db))
+
+    rpa = select(Event.revenue_per_attendee).where(Event.id == Score.event_id).scalar_subquery()
+    if key[0] == "default":
+        changed = or_(Score.benchmark_min != 5.0, Score.benchmark_max != 50.0)
+    elif key[0] == "percentile":
+        changed = Score.benchmark_n != key[1]
+    else:
+        _, low, next_low, high, next_high = key
+        changed = or_(
+            Score.benchmark_min != case((rpa <= low, next_low), else_=low),
+            Score.benchmark_max != case((rpa > high, high), else_=next_high)
+        )
+    stale = [
+        Score.revenue_stale.isnot(True),
+        rpa.isnot(None),
+        or_(Score.benchmark_n.is_(None), changed)
+    ]
+    event_ids = [event_id for (event_id,) in db.query(Score.event_id).filter(*stale)]
+    if event_ids:
+        db.query(Score).filter(*stale).update({Score.revenue_stale: True}, synchronize_session=False)
+    return event_ids
+
+
+def refresh_stale_scores(db: Session, event_ids: Optional[List[int]] = None, batch_size: int = 500) -> List[int]:
+    # Only the revenue half changed: rescore it against the current index and re-blend with the stored feedback score
+    refreshed = []
+    while True:
+        query = (
+            db.query(Score.id, Score.event_id, Score.feedback_score, Score.explanation, Event.revenue, Event.attendance)
+            .join(Event, Event.id == Score.event_id)
+            .filter(Score.revenue_stale.is_(True))
+        )
+        if event_ids is not None:
+            query = query.filter(Score.event_id.in_(event_ids))
+        rows = query.order_by(Score.event_id).limit(batch_size).all()
+        if not rows:
+            return refreshed
+
+        ids = [row.event_id for row in rows]
+        revenue_scores, explanations, benchmarks = score_revenues(
+            [row.revenue for row in rows], [row.attendance for row in rows], get_revenue_index(db)
+        )
+        value_scores = compute_value_score(np.array([row.feedback_score for row in rows], dtype=float), revenue_scores)
+
+        found, X = load_features(db, ids)
+        features = {event_id: dict(zip(FEATURE_ORDER, x)) for event_id, x in zip(found, X.tolist())}
+        record_scores(db, {
+            row.event_id: score_metrics(float(revenue), row.feedback_score, float(value), features.get(row.event_id))
+            for row, revenue, value in zip(rows, revenue_scores, value_scores)
+        })
+
+        db.execute(update(Score), [
+            {
+                "id": row.id,
+                "revenue_score": float(revenue_scores[i]),
+                "value_score": float(value_scores[i]),
+                "explanation": {**(row.explanation or {}), "revenue": explanations[i]},
+                "benchmark_min": float(benchmarks["benchmark_min"][i]),
+                "benchmark_max": float(benchmarks["benchmark_max"][i]),
+                "benchmark_n": int(benchmarks["benchmark_n"][i]),
+                "revenue_stale": False
+            }
+            for i, row in enumerate(rows)
+        ])
+        db.commit()
+        invalidate(HISTORY, ANALYTICS, *(score_scope(event_id) for event_id in ids))
+        refreshed.extend(ids)
+
+
+def refresh_stale_revenue(event_ids: Optional[List[int]] = None):
+    with _refresh_lock:
+        db = SessionLocal()
+        try:
+            refresh_stale_scores(db, event_ids)
+        finally:
+            db.close()
@@ -1,8 +1,37 @@
-from textblob import TextBlob
-from typing import List, Dict, Tuple, Optional
-import numpy as np
-from sklearn.linear_model import Ridge
+from __future__ import annotations
+
+from typing import Iterable, List, Dict, Tuple, Optional, Union
+import bisect
+import importlib
 import json
+import os
+import re
+import threading
+
+from metrics import timed, timer
+from sentiment import get_backend
+
+
+class _LazyModule:
+    # Imports the module on first attribute access. importlib's LazyLoader is not thread-safe on 3.11: threads
+    # touching it cold while another is loading it see a half-initialised module, so the load runs under a lock.
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        value = getattr(self._module, attr)
+        # Later lookups of the same name skip __getattr__
+        setattr(self, attr, value)
+        return value
+
+
+np = _LazyModule("numpy")
 
 CATEGORIES = ["logistics", "food", "program", "venue", "timing", "community", "vibe"]
 
@@ -16,107 +45,299 @@ CATEGORY_KEYWORDS = {
     "vibe": ["atmosphere", "energy", "fun", "enjoyable", "memorable", "amazing", "great", "loved", "fantastic", "disappointing"]
 }
 
+FEATURE_ORDER = CATEGORIES + ["sentiment", "avg_rating", "positive_count", "negative_count"]
+
+REVENUE_BENCHMARK_MODE = os.getenv("REVENUE_BENCHMARK_MODE", "minmax")
+REVENUE_TRIM = float(os.getenv("REVENUE_TRIM", "0.1"))
+
 POSITIVE_WORDS = ["great", "amazing", "excellent", "wonderful", "fantastic", "loved", "enjoyed", "perfect", "awesome", "best", "good", "nice", "helpful", "friendly", "welcoming", "organized", "smooth", "delicious", "engaging", "informative", "comfortable", "fun", "memorable", "inclusive"]
 NEGATIVE_WORDS = ["bad", "terrible", "awful", "disappointing", "boring", "confusing", "chaotic", "late", "crowded", "rushed", "long", "cold", "hot", "hungry", "uncomfortable", "disorganized", "poor", "worst", "waste", "lacking"]
 
 
-def extract_features(feedbacks: List[Dict]) -> Dict:
-    if not feedbacks:
-        return {cat: 0.0 for cat in CATEGORIES + ["sentiment", "avg_rating", "positive_count", "negative_count"]}
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _build_term_roles() -> Dict[str, List[Tuple[str, Optional[str], int]]]:
+    roles: Dict[str, List[Tuple[str, Optional[str], int]]] = {}
+    for cat, keywords in CATEGORY_KEYWORDS.items():
+        for i, kw in enumerate(keywords):
+            roles.setdefault(kw, []).append(("category", cat, i))
+    for i, word in enumerate(POSITIVE_WORDS):
+        roles.setdefault(word, []).append(("positive", None, i))
+    for i, word in enumerate(NEGATIVE_WORDS):
+        roles.setdefault(word, []).append(("negative", None, i))
+    return roles
+
+
+_TERM_ROLES = _build_term_roles()
+_MAX_NGRAM = max(len(term.split()) for term in _TERM_ROLES)
+_POSITIVE_SET = set(POSITIVE_WORDS)
+_NEGATIVE_SET = set(NEGATIVE_WORDS)
+_POSITIVE_POSITION = {word: i for i, word in enumerate(POSITIVE_WORDS)}
+_NEGATIVE_POSITION = {word: i for i, word in enumerate(NEGATIVE_WORDS)}
+_POSITIVE_KEYWORDS = {kw for kws in CATEGORY_KEYWORDS.values() for kw in kws if _POSITIVE_SET.intersection(kw.split())}
+_NEGATIVE_KEYWORDS = {kw for kws in CATEGORY_KEYWORDS.values() for kw in kws if _NEGATIVE_SET.intersection(kw.split())}
+
+
+@timed("scoring.keywords")
+def match_keywords(text: str) -> Dict:
+    tokens = _TOKEN_RE.findall(text.lower())
+    grams = set(tokens)
+    for n in range(2, _MAX_NGRAM + 1):
+        grams.update(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    
+    found: Dict[Tuple[str, Optional[str]], List[Tuple[int, str]]] = {}
+    for term in grams.intersection(_TERM_ROLES):
+        for role, cat, position in _TERM_ROLES[term]:
+            found.setdefault((role, cat), []).append((position, term))
+    
+    hits = {"categories": {}, "positive": [], "negative": []}
+    for (role, cat), terms in found.items():
+        ordered = [term for _, term in sorted(terms)]
+        if role == "category":
+            hits["categories"][cat] = ordered
+        else:
+            hits[role] = ordered
+    return hits
+
+
+@timed("scoring.sentiment")
+def sentiment_polarity(text: str) -> float:
+    return get_backend().polarity(text)
+
+
+@timed("scoring.sentiment_batch")
+def sentiment_polarities(texts: List[str]) -> List[float]:
+    return get_backend().polarities(texts)
+
+
+def analyze_feedback(text: str) -> Dict:
+    return {"polarity": sentiment_polarity(text), "hits": match_keywords(text)}
+
+
+def analyze_feedbacks(texts: List[str]) -> List[Dict]:
+    return [{"polarity": polarity, "hits": match_keywords(text)} for text, polarity in zip(texts, sentiment_polarities(texts))]
+
+
+def _analyzed(feedback: Dict) -> Dict:
+    if feedback.get("polarity") is None:
+        feedback = {**feedback, "polarity": sentiment_polarity(feedback["text"])}
+    if feedback.get("hits") is None:
+        feedback = {**feedback, "hits": match_keywords(feedback["text"])}
+    return feedback
+
+
+def empty_aggregate() -> Dict:
+    return {
+        "feedback_count": 0,
+        "polarity_sum": 0.0,
+        "rating_sum": 0,
+        "rating_count": 0,
+        "category_hits": {},
+        "positive_hits": {},
+        "negative_hits": {},
+        "strong_positive_hits": {},
+        "strong_negative_hits": {}
+    }
+
+
+def _count_into(counts: Dict[str, int], terms: List[str]) -> Dict[str, int]:
+    counts = dict(counts)
+    for term in terms:
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+def add_to_aggregate(aggregate: Dict, feedback: Dict) -> Dict:
+    feedback = _analyzed(feedback)
+    hits = feedback["hits"]
+    updated = dict(aggregate)
+    
+    updated["feedback_count"] += 1
+    updated["polarity_sum"] += feedback["polarity"]
+    if feedback.get("rating") is not None:
+        updated["rating_sum"] += feedback["rating"]
+        updated["rating_count"] += 1
+    
+    category_hits = dict(aggregate["category_hits"])
+    for cat, terms in hits["categories"].items():
+        category_hits[cat] = _count_into(category_hits.get(cat, {}), terms)
+    updated["category_hits"] = category_hits
     
-    all_text = " ".join([f["text"].lower() for f in feedbacks])
+    updated["positive_hits"] = _count_into(aggregate["positive_hits"], hits["positive"])
+    updated["negative_hits"] = _count_into(aggregate["negative_hits"], hits["negative"])
+    if feedback["polarity"] > 0.3:
+        updated["strong_positive_hits"] = _count_into(aggregate["strong_positive_hits"], hits["positive"])
+    elif feedback["polarity"] < -0.3:
+        updated["strong_negative_hits"] = _count_into(aggregate["strong_negative_hits"], hits["negative"])
+    
+    return updated
+
+
+def aggregate_feedbacks(feedbacks: List[Dict]) -> Dict:
+    aggregate = empty_aggregate()
+    for f in feedbacks:
+        aggregate = add_to_aggregate(aggregate, f)
+    return aggregate
+
+
+def features_from_aggregate(aggregate: Dict) -> Dict:
+    if not aggregate["feedback_count"]:
+        return {key: 0.0 for key in FEATURE_ORDER}
     
     features = {}
     for cat, keywords in CATEGORY_KEYWORDS.items():
-        count = sum(1 for kw in keywords if kw in all_text)
-        features[cat] = min(count / len(keywords), 1.0)
+        features[cat] = min(len(aggregate["category_hits"].get(cat, {})) / len(keywords), 1.0)
     
-    sentiments = []
-    for f in feedbacks:
-        blob = TextBlob(f["text"])
-        sentiments.append(blob.sentiment.polarity)
-    features["sentiment"] = np.mean(sentiments) if sentiments else 0.0
+    features["sentiment"] = aggregate["polarity_sum"] / aggregate["feedback_count"]
     
-    ratings = [f["rating"] for f in feedbacks if f.get("rating") is not None]
-    features["avg_rating"] = np.mean(ratings) / 5.0 if ratings else 0.5
+    if aggregate["rating_count"]:
+        features["avg_rating"] = aggregate["rating_sum"] / aggregate["rating_count"] / 5.0
+    else:
+        features["avg_rating"] = 0.5
     
-    positive_count = sum(1 for word in POSITIVE_WORDS if word in all_text)
-    negative_count = sum(1 for word in NEGATIVE_WORDS if word in all_text)
-    features["positive_count"] = min(positive_count / 10.0, 1.0)
-    features["negative_count"] = min(negative_count / 10.0, 1.0)
+    features["positive_count"] = min(len(aggregate["positive_hits"]) / 10.0, 1.0)
+    features["negative_count"] = min(len(aggregate["negative_hits"]) / 10.0, 1.0)
     
     return features
 
 
-def extract_themes(feedbacks: List[Dict]) -> Tuple[List[str], List[str]]:
+def _strong_themes(counts: Dict[str, int], positions: Dict[str, int], seen: set) -> List[str]:
+    words = sorted((w for w in counts if w not in seen), key=lambda w: (-counts[w], positions[w]))
+    return [w.title() for w in words]
+
+
+def themes_from_aggregate(aggregate: Dict) -> Tuple[List[str], List[str]]:
     positive_themes = []
     negative_themes = []
-    
-    all_text = " ".join([f["text"].lower() for f in feedbacks])
+    seen_positive = set()
+    seen_negative = set()
     
     for cat, keywords in CATEGORY_KEYWORDS.items():
-        mentioned_keywords = [kw for kw in keywords if kw in all_text]
-        if mentioned_keywords:
-            positive_in_cat = [kw for kw in mentioned_keywords if kw in POSITIVE_WORDS or any(pw in kw for pw in POSITIVE_WORDS)]
-            negative_in_cat = [kw for kw in mentioned_keywords if kw in NEGATIVE_WORDS or any(nw in kw for nw in NEGATIVE_WORDS)]
+        mentioned = aggregate["category_hits"].get(cat)
+        if mentioned:
+            positive_in_cat = [kw for kw in keywords if kw in mentioned and kw in _POSITIVE_KEYWORDS][:2]
+            negative_in_cat = [kw for kw in keywords if kw in mentioned and kw in _NEGATIVE_KEYWORDS][:2]
             
             if positive_in_cat:
-                positive_themes.append(f"{cat.title()}: {', '.join(positive_in_cat[:2])}")
+                positive_themes.append(f"{cat.title()}: {', '.join(positive_in_cat)}")
+                seen_positive.update(positive_in_cat)
             if negative_in_cat:
-                negative_themes.append(f"{cat.title()}: {', '.join(negative_in_cat[:2])}")
+                negative_themes.append(f"{cat.title()}: {', '.join(negative_in_cat)}")
+                seen_negative.update(negative_in_cat)
     
-    for f in feedbacks:
-        blob = TextBlob(f["text"])
-        if blob.sentiment.polarity > 0.3:
-            for word in POSITIVE_WORDS:
-                if word in f["text"].lower() and f"{word}" not in str(positive_themes):
-                    positive_themes.append(word.title())
-                    break
-        elif blob.sentiment.polarity < -0.3:
-            for word in NEGATIVE_WORDS:
-                if word in f["text"].lower() and f"{word}" not in str(negative_themes):
-                    negative_themes.append(word.title())
-                    break
+    positive_themes += _strong_themes(aggregate["strong_positive_hits"], _POSITIVE_POSITION, seen_positive)
+    negative_themes += _strong_themes(aggregate["strong_negative_hits"], _NEGATIVE_POSITION, seen_negative)
     
     return positive_themes[:5], negative_themes[:5]
 
 
-def rubric_feedback_score(features: Dict) -> float:
-    base_score = 50.0
+def extract_features(feedbacks: List[Dict]) -> Dict:
+    return features_from_aggregate(aggregate_feedbacks(feedbacks))
+
+
+def extract_themes(feedbacks: List[Dict]) -> Tuple[List[str], List[str]]:
+    return themes_from_aggregate(aggregate_feedbacks(feedbacks))
+
+
+# Multipliers of the hand-written rubric used until enough admin labels exist to train a model
+RUBRIC_WEIGHTS = {
+    "base": 50.0,
+    "sentiment": 20.0,
+    "rating": 30.0,
+    "positive": 10.0,
+    "negative": 15.0,
+    "category": 10.0
+}
+VALUE_WEIGHTS = {"feedback": 0.50, "revenue": 0.50}
+
+
+def rubric_feedback_score(features: Dict, rubric: Optional[Dict[str, float]] = None) -> float:
+    rubric = {**RUBRIC_WEIGHTS, **(rubric or {})}
+    base_score = rubric["base"]
     
-    sentiment_contribution = features.get("sentiment", 0) * 20
+    sentiment_contribution = features.get("sentiment", 0) * rubric["sentiment"]
     base_score += sentiment_contribution
     
-    rating_contribution = (features.get("avg_rating", 0.5) - 0.5) * 30
+    rating_contribution = (features.get("avg_rating", 0.5) - 0.5) * rubric["rating"]
     base_score += rating_contribution
     
-    positive_boost = features.get("positive_count", 0) * 10
-    negative_penalty = features.get("negative_count", 0) * 15
+    positive_boost = features.get("positive_count", 0) * rubric["positive"]
+    negative_penalty = features.get("negative_count", 0) * rubric["negative"]
     base_score += positive_boost - negative_penalty
     
     category_scores = [features.get(cat, 0) for cat in CATEGORIES]
     category_avg = np.mean(category_scores) if category_scores else 0
-    base_score += category_avg * 10
+    base_score += category_avg * rubric["category"]
     
     return max(0, min(100, base_score))
 
 
-def compute_feedback_score(feedbacks: List[Dict], model_weights: Optional[Dict] = None) -> Tuple[float, Dict, Dict]:
-    features = extract_features(feedbacks)
-    positive_themes, negative_themes = extract_themes(feedbacks)
+def rubric_feedback_scores(X: np.ndarray, rubric: Optional[Dict[str, float]] = None) -> np.ndarray:
+    rubric = {**RUBRIC_WEIGHTS, **(rubric or {})}
+    columns = {key: X[:, i] for i, key in enumerate(FEATURE_ORDER)}
+    base_score = np.full(len(X), rubric["base"])
     
-    if model_weights and len(model_weights.get("coefficients", [])) > 0:
-        feature_vector = [features.get(key, 0) for key in model_weights["feature_order"]]
-        score = model_weights["intercept"]
-        for i, coef in enumerate(model_weights["coefficients"]):
-            score += coef * feature_vector[i]
-        score = max(0, min(100, score))
-        method = "learned"
-    else:
-        score = rubric_feedback_score(features)
-        method = "rubric"
+    base_score += columns["sentiment"] * rubric["sentiment"]
+    base_score += (columns["avg_rating"] - 0.5) * rubric["rating"]
+    base_score += columns["positive_count"] * rubric["positive"] - columns["negative_count"] * rubric["negative"]
+    base_score += X[:, :len(CATEGORIES)].mean(axis=1) * rubric["category"]
     
-    explanation = {
+    return np.clip(base_score, 0, 100)
+
+
+class LinearModel:
+    def __init__(self, feature_order: List[str], coefficients: List[float], intercept: float, version: Optional[int] = None):
+        self.feature_order = list(feature_order)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.intercept = float(intercept)
+        self.version = version
+    
+    @classmethod
+    def from_weights(cls, weights: Dict, version: Optional[int] = None) -> "LinearModel":
+        return cls(weights["feature_order"], weights["coefficients"], weights["intercept"], version)
+    
+    def vectorize(self, features: Dict) -> np.ndarray:
+        return np.fromiter((features.get(key, 0) for key in self.feature_order), dtype=float, count=len(self.feature_order))
+    
+    def predict(self, features: Dict) -> float:
+        return float(self.intercept + self.coefficients @ self.vectorize(features))
+    
+    def predict_many(self, X: np.ndarray) -> np.ndarray:
+        return self.intercept + X @ self.coefficients
+
+
+ModelWeights = Union[Dict, LinearModel]
+
+
+def compute_feedback_score(feedbacks: List[Dict], model_weights: Optional[ModelWeights] = None) -> Tuple[float, Dict, Dict]:
+    return compute_aggregate_score(aggregate_feedbacks(feedbacks), model_weights)
+
+
+def compute_aggregate_score(aggregate: Dict, model_weights: Optional[ModelWeights] = None) -> Tuple[float, Dict, Dict]:
+    with timer("scoring.features"):
+        features = features_from_aggregate(aggregate)
+    with timer("scoring.themes"):
+        positive_themes, negative_themes = themes_from_aggregate(aggregate)
+    
+    if isinstance(model_weights, dict) and len(model_weights.get("coefficients", [])) > 0:
+        model_weights = LinearModel.from_weights(model_weights)
+    
+    with timer("scoring.feedback_model"):
+        if isinstance(model_weights, LinearModel) and len(model_weights.coefficients) > 0:
+            score = max(0, min(100, model_weights.predict(features)))
+            method = "learned"
+        else:
+            score = rubric_feedback_score(features)
+            method = "rubric"
+    
+    explanation = _feedback_explanation(features, method, positive_themes, negative_themes)
+    
+    return score, features, explanation
+
+
+def _feedback_explanation(features: Dict, method: str, positive_themes: List[str], negative_themes: List[str]) -> Dict:
+    return {
         "method": method,
         "positive_themes": positive_themes,
         "negative_themes": negative_themes,
@@ -124,26 +345,110 @@ def compute_feedback_score(feedbacks: List[Dict], model_weights: Optional[Dict]
         "sentiment_avg": round(features.get("sentiment", 0), 3),
         "rating_avg": round(features.get("avg_rating", 0.5) * 5, 1) if features.get("avg_rating") else None
     }
+
+
+class RevenueIndex:
+    def __init__(self, values: Iterable[float] = (), _skip: Optional[int] = None):
+        self._values = sorted(values) if _skip is None else values
+        self._skip = _skip
     
-    return score, features, explanation
+    def __len__(self) -> int:
+        return len(self._values) - (self._skip is not None)
+    
+    def excluding(self, value: float) -> "RevenueIndex":
+        i = bisect.bisect_left(self._values, value)
+        if i < len(self._values) and self._values[i] == value:
+            return RevenueIndex(self._values, _skip=i)
+        return self
+    
+    def _at(self, i: int) -> float:
+        if self._skip is not None and i >= self._skip:
+            i += 1
+        return self._values[i]
+    
+    def bounds(self, trim: float = 0.0) -> Tuple[float, float]:
+        n = len(self)
+        k = min(int(n * trim), (n - 1) // 2)
+        return self._at(k), self._at(n - 1 - k)
+    
+    def exclusion_bounds(self, trim: float = 0.0) -> Tuple[float, float, float, float]:
+        # bounds() without one of the index's own values x: the low end is the first value returned if x is
+        # above it and the second otherwise, the high end the third if x is above it and the fourth otherwise
+        n = len(self._values) - 1
+        k = min(int(n * trim), (n - 1) // 2)
+        return self._values[k], self._values[k + 1], self._values[n - 1 - k], self._values[n - k]
+    
+    def _skips(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        sorted_values = np.asarray(self._values, dtype=float)
+        left = np.searchsorted(sorted_values, values, side="left")
+        present = left < len(sorted_values)
+        present[present] = sorted_values[left[present]] == values[present]
+        skip = np.where(present, left, len(sorted_values))
+        return sorted_values, skip, present
+    
+    def bounds_many(self, values: np.ndarray, trim: float = 0.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Vectorized bounds() for many events at once, each benchmarked against the index without itself
+        sorted_values, skip, present = self._skips(values)
+        n = len(sorted_values) - present
+        k = np.minimum((n * trim).astype(int), np.maximum(n - 1, 0) // 2)
+        low = np.where(k >= skip, k + 1, k)
+        high = np.where(n - 1 - k >= skip, n - k, n - 1 - k)
+        last = max(len(sorted_values) - 1, 0)
+        if not len(sorted_values):
+            return np.zeros(len(values)), np.zeros(len(values)), n
+        return sorted_values[np.clip(low, 0, last)], sorted_values[np.clip(high, 0, last)], n
+    
+    def percentile_many(self, values: np.ndarray) -> np.ndarray:
+        sorted_values, skip, present = self._skips(values)
+        below = np.searchsorted(sorted_values, values, side="left")
+        equal = np.searchsorted(sorted_values, values, side="right") - below - present
+        n = len(sorted_values) - present
+        return (below + 0.5 * equal) / np.maximum(n, 1) * 100
+    
+    def percentile(self, value: float) -> float:
+        below = bisect.bisect_left(self._values, value)
+        equal = bisect.bisect_right(self._values, value) - below
+        if self._skip is not None:
+            if self._values[self._skip] < value:
+                below -= 1
+            elif self._values[self._skip] == value:
+                equal -= 1
+        return (below + 0.5 * equal) / len(self) * 100
+
 
+@timed("scoring.revenue")
+def revenue_benchmark(past_events: RevenueIndex, mode: Optional[str] = None) -> Dict:
+    mode = mode or REVENUE_BENCHMARK_MODE
+    n = len(past_events)
+    if n < 3:
+        return {"benchmark_min": 5.0, "benchmark_max": 50.0, "benchmark_n": n}
+    min_rpa, max_rpa = past_events.bounds(REVENUE_TRIM if mode == "trimmed" else 0.0)
+    return {"benchmark_min": min_rpa, "benchmark_max": max_rpa, "benchmark_n": n}
 
-def compute_revenue_score(revenue: float, attendance: int, past_events: List[Dict]) -> Tuple[float, Dict]:
+
+def compute_revenue_score(
+    revenue: float,
+    attendance: int,
+    past_events: Union[List[Dict], RevenueIndex],
+    mode: Optional[str] = None
+) -> Tuple[float, Dict]:
     if attendance <= 0:
         return 0, {"error": "Invalid attendance"}
     
+    mode = mode or REVENUE_BENCHMARK_MODE
     revenue_per_attendee = revenue / attendance
     
-    past_rpa = [e["revenue"] / e["attendance"] for e in past_events if e["attendance"] > 0]
-    
-    if len(past_rpa) >= 3:
-        min_rpa = min(past_rpa)
-        max_rpa = max(past_rpa)
+    if isinstance(past_events, RevenueIndex):
+        index = past_events
     else:
-        min_rpa = 5.0
-        max_rpa = 50.0
+        index = RevenueIndex(e["revenue"] / e["attendance"] for e in past_events if e["attendance"] > 0)
+    rolling = len(index) >= 3
+    benchmark = revenue_benchmark(index, mode)
+    min_rpa, max_rpa = benchmark["benchmark_min"], benchmark["benchmark_max"]
     
-    if max_rpa == min_rpa:
+    if mode == "percentile" and rolling:
+        score = index.percentile(revenue_per_attendee)
+    elif max_rpa == min_rpa:
         score = 50.0
     else:
         normalized = (revenue_per_attendee - min_rpa) / (max_rpa - min_rpa)
@@ -151,43 +456,209 @@ def compute_revenue_score(revenue: float, attendance: int, past_events: List[Dic
     
     score = max(0, min(100, score))
     
+    return score, _revenue_explanation(revenue_per_attendee, min_rpa, max_rpa, rolling, mode, score)
+
+
+def _revenue_explanation(revenue_per_attendee: float, min_rpa: float, max_rpa: float, rolling: bool, mode: str, score: float) -> Dict:
     explanation = {
         "revenue_per_attendee": round(revenue_per_attendee, 2),
         "min_benchmark": round(min_rpa, 2),
         "max_benchmark": round(max_rpa, 2),
-        "normalization": "rolling" if len(past_rpa) >= 3 else "default"
+        "normalization": "rolling" if rolling else "default",
+        "mode": mode
     }
+    if mode == "percentile" and rolling:
+        explanation["percentile"] = round(score, 1)
+    return explanation
+
+
+def compute_value_score(feedback_score: float, revenue_score: float, weights: Optional[Dict[str, float]] = None) -> float:
+    weights = weights or VALUE_WEIGHTS
+    return weights["feedback"] * feedback_score + weights["revenue"] * revenue_score
+
+
+SCORE_DTYPE = [
+    ("event_id", "i8"),
+    ("feedback_score", "f8"),
+    ("revenue_score", "f8"),
+    ("value_score", "f8"),
+    ("benchmark_min", "f8"),
+    ("benchmark_max", "f8"),
+    ("benchmark_n", "i8")
+]
+
+
+def feature_matrix(features: List[Dict], feature_order: List[str] = FEATURE_ORDER) -> np.ndarray:
+    return np.array([[f.get(key, 0) for key in feature_order] for f in features], dtype=float).reshape(len(features), len(feature_order))
+
+
+def score_revenues(
+    revenue: Iterable[float],
+    attendance: Iterable[float],
+    revenue_index: Optional[RevenueIndex] = None,
+    mode: Optional[str] = None
+) -> Tuple[np.ndarray, List[Dict], Dict[str, np.ndarray]]:
+    mode = mode or REVENUE_BENCHMARK_MODE
+    revenue = np.asarray(revenue, dtype=float)
+    attendance = np.asarray(attendance, dtype=float)
+    valid = attendance > 0
+    rpa = np.divide(revenue, attendance, out=np.zeros(len(revenue)), where=valid)
+    if revenue_index is None:
+        revenue_index = RevenueIndex(rpa[valid].tolist())
+    
+    min_rpa, max_rpa, n_past = revenue_index.bounds_many(rpa, REVENUE_TRIM if mode == "trimmed" else 0.0)
+    rolling = n_past >= 3
+    min_rpa = np.where(rolling, min_rpa, 5.0)
+    max_rpa = np.where(rolling, max_rpa, 50.0)
+    
+    span = max_rpa - min_rpa
+    revenue_scores = np.where(span == 0, 50.0, (rpa - min_rpa) / np.where(span == 0, 1.0, span) * 100)
+    if mode == "percentile":
+        revenue_scores = np.where(rolling, revenue_index.percentile_many(rpa), revenue_scores)
+    revenue_scores = np.where(valid, np.clip(revenue_scores, 0, 100), 0.0)
     
-    return score, explanation
+    explanations = [
+        _revenue_explanation(rpa[i], min_rpa[i], max_rpa[i], bool(rolling[i]), mode, revenue_scores[i]) if valid[i] else {"error": "Invalid attendance"}
+        for i in range(len(revenue))
+    ]
+    return revenue_scores, explanations, {"benchmark_min": min_rpa, "benchmark_max": max_rpa, "benchmark_n": n_past}
 
 
-def compute_value_score(feedback_score: float, revenue_score: float) -> float:
-    return 0.50 * feedback_score + 0.50 * revenue_score
+@timed("scoring.batch")
+def score_events(
+    batch: List[Dict],
+    model_weights: Optional[ModelWeights] = None,
+    revenue_index: Optional[RevenueIndex] = None,
+    mode: Optional[str] = None
+) -> Tuple[np.ndarray, List[Dict]]:
+    mode = mode or REVENUE_BENCHMARK_MODE
+    
+    features = []
+    themes = []
+    for item in batch:
+        if "aggregate" in item:
+            features.append(features_from_aggregate(item["aggregate"]))
+            themes.append(themes_from_aggregate(item["aggregate"]))
+        else:
+            features.append(item["features"])
+            themes.append(item.get("themes", ([], [])))
+    
+    if isinstance(model_weights, dict) and len(model_weights.get("coefficients", [])) > 0:
+        model_weights = LinearModel.from_weights(model_weights)
+    if isinstance(model_weights, LinearModel) and len(model_weights.coefficients) > 0:
+        feedback_scores = np.clip(model_weights.predict_many(feature_matrix(features, model_weights.feature_order)), 0, 100)
+        method = "learned"
+    else:
+        feedback_scores = rubric_feedback_scores(feature_matrix(features))
+        method = "rubric"
+    
+    revenue_scores, revenue_explanations, benchmarks = score_revenues(
+        [item["revenue"] for item in batch], [item["attendance"] for item in batch], revenue_index, mode
+    )
+    
+    result = np.zeros(len(batch), dtype=SCORE_DTYPE)
+    result["event_id"] = [item.get("event_id", i) for i, item in enumerate(batch)]
+    result["feedback_score"] = feedback_scores
+    result["revenue_score"] = revenue_scores
+    result["value_score"] = compute_value_score(feedback_scores, revenue_scores)
+    for field, values in benchmarks.items():
+        result[field] = values
+    
+    explanations = []
+    for i in range(len(batch)):
+        explanations.append({
+            "features": features[i],
+            "feedback": _feedback_explanation(features[i], method, *themes[i]),
+            "revenue": revenue_explanations[i],
+            "weights": dict(VALUE_WEIGHTS)
+        })
+    
+    return result, explanations
 
 
-def train_model(training_data: List[Dict]) -> Optional[Dict]:
+@timed("scoring.train")
+def train_model(training_data: List[Dict], alpha: float = 1.0) -> Optional[Dict]:
     if len(training_data) < 5:
         return None
+    X = feature_matrix([item["features"] for item in training_data])
+    y = np.array([item["label"] for item in training_data], dtype=float)
+    return train_matrix(X, y, alpha)
+
+
+def train_matrix(X: np.ndarray, y: np.ndarray, alpha: float = 1.0, feature_order: List[str] = FEATURE_ORDER) -> Optional[Dict]:
+    if len(y) < 5:
+        return None
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
     
-    feature_order = CATEGORIES + ["sentiment", "avg_rating", "positive_count", "negative_count"]
-    
-    X = []
-    y = []
+    x_mean = X.mean(axis=0)
+    y_mean = y.mean()
+    X_centered = X - x_mean
+    coefficients = np.linalg.solve(X_centered.T @ X_centered + alpha * np.eye(X.shape[1]), X_centered.T @ (y - y_mean))
     
-    for item in training_data:
-        features = item["features"]
-        feature_vector = [features.get(key, 0) for key in feature_order]
-        X.append(feature_vector)
-        y.append(item["label"])
+    return {
+        "feature_order": list(feature_order),
+        "coefficients": coefficients.tolist(),
+        "intercept": float(y_mean - x_mean @ coefficients)
+    }
+
+
+def feature_vector(features: Dict, feature_order: List[str] = FEATURE_ORDER) -> List[float]:
+    return [float(features.get(key, 0)) for key in feature_order]
+
+
+def empty_training_stats(feature_order: List[str] = FEATURE_ORDER) -> Dict:
+    d = len(feature_order)
+    return {
+        "feature_order": list(feature_order),
+        "n": 0,
+        "xtx": [[0.0] * d for _ in range(d)],
+        "xty": [0.0] * d,
+        "x_sum": [0.0] * d,
+        "y_sum": 0.0
+    }
+
+
+def training_stats_from_matrix(X: np.ndarray, y: np.ndarray, feature_order: List[str] = FEATURE_ORDER) -> Dict:
+    X = np.asarray(X, dtype=float).reshape(len(y), len(feature_order))
+    y = np.asarray(y, dtype=float)
+    return {
+        "feature_order": list(feature_order),
+        "n": len(y),
+        "xtx": (X.T @ X).tolist(),
+        "xty": (X.T @ y).tolist(),
+        "x_sum": X.sum(axis=0).tolist(),
+        "y_sum": float(y.sum())
+    }
+
+
+def update_training_stats(stats: Dict, x: List[float], y: float, weight: int = 1) -> Dict:
+    x = np.asarray(x, dtype=float)
+    return {
+        "feature_order": stats["feature_order"],
+        "n": stats["n"] + weight,
+        "xtx": (np.asarray(stats["xtx"]) + weight * np.outer(x, x)).tolist(),
+        "xty": (np.asarray(stats["xty"]) + weight * y * x).tolist(),
+        "x_sum": (np.asarray(stats["x_sum"]) + weight * x).tolist(),
+        "y_sum": stats["y_sum"] + weight * y
+    }
+
+
+@timed("scoring.solve_ridge")
+def solve_ridge(stats: Dict, alpha: float = 1.0) -> Optional[Dict]:
+    n = stats["n"]
+    if n < 5:
+        return None
     
-    X = np.array(X)
-    y = np.array(y)
+    x_mean = np.asarray(stats["x_sum"]) / n
+    y_mean = stats["y_sum"] / n
+    centered_xtx = np.asarray(stats["xtx"]) - n * np.outer(x_mean, x_mean)
+    centered_xty = np.asarray(stats["xty"]) - n * x_mean * y_mean
     
-    model = Ridge(alpha=1.0)
-    model.fit(X, y)
+    coefficients = np.linalg.solve(centered_xtx + alpha * np.eye(len(x_mean)), centered_xty)
     
     return {
-        "feature_order": feature_order,
-        "coefficients": model.coef_.tolist(),
-        "intercept": float(model.intercept_)
+        "feature_order": stats["feature_order"],
+        "coefficients": coefficients.tolist(),
+        "intercept": float(y_mean - x_mean @ coefficients)
     }
@@ -0,0 +1,98 @@
+import base64
+import json
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.orm import Session
+
+from models import Feedback
+from scoring import CATEGORY_KEYWORDS
+
+SNIPPET_TOKENS = 16
+HIGHLIGHT = ("<mark>", "</mark>")
+
+_TERM_RE = re.compile(r"\w+")
+
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def build_match(q: Optional[str], categories: Sequence[str] = (), match: str = "all") -> str:
+    terms = [_phrase(term) for term in _TERM_RE.findall((q or "").lower())]
+    clauses = []
+    if terms:
+        clauses.append(terms[0] if len(terms) == 1 else "(" + (" OR " if match == "any" else " AND ").join(terms) + ")")
+    for category in categories:
+        keywords = CATEGORY_KEYWORDS.get(category.lower())
+        if keywords is None:
+            raise HTTPException(status_code=400, detail=f"Unknown category '{category}'")
+        clauses.append("(" + " OR ".join(_phrase(keyword) for keyword in keywords) + ")")
+    if not clauses:
+        raise HTTPException(status_code=400, detail="Provide a search query or a category")
+    return " AND ".join(clauses)
+
+
+def encode_cursor(rank: float, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        rank, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def search_feedbacks(
+    db: Session,
+    q: Optional[str] = None,
+    categories: Sequence[str] = (),
+    event_ids: Sequence[int] = (),
+    match: str = "all",
+    cursor: Optional[str] = None,
+    limit: int = 20
+) -> Tuple[List[Dict], Optional[str]]:
+    params = {
+        "match": build_match(q, categories, match),
+        "open": HIGHLIGHT[0],
+        "close": HIGHLIGHT[1],
+        "tokens": SNIPPET_TOKENS,
+        "limit": limit + 1
+    }
+    filters = ["feedbacks_fts MATCH :match"]
+    if event_ids:
+        bounds = select(func.min(Feedback.id), func.max(Feedback.id)).where(Feedback.event_id.in_(event_ids))
+        params["low_id"], params["high_id"] = db.execute(bounds).one()
+        if params["low_id"] is None:
+            return [], None
+        filters.append("feedbacks_fts.rowid BETWEEN :low_id AND :high_id")
+        filters.append("f.event_id IN :event_ids")
+        params["event_ids"] = list(event_ids)
+    if cursor:
+        params["after_rank"], params["after_id"] = decode_cursor(cursor)
+        filters.append("(bm25(feedbacks_fts) > :after_rank OR (bm25(feedbacks_fts) = :after_rank AND f.id > :after_id))")
+
+    statement = text(f"""
+        SELECT f.id, f.event_id, e.name AS event_name, f.respondent_id, f.text, f.rating,
+               snippet(feedbacks_fts, 0, :open, :close, '…', :tokens) AS snippet,
+               bm25(feedbacks_fts) AS rank
+        FROM feedbacks_fts
+        JOIN feedbacks f ON f.id = feedbacks_fts.rowid
+        JOIN events e ON e.id = f.event_id
+        WHERE {" AND ".join(filters)}
+        ORDER BY rank, f.id
+        LIMIT :limit
+    """)
+    if event_ids:
+        statement = statement.bindparams(bindparam("event_ids", expanding=True))
+
+    rows = [dict(row._mapping) for row in db.execute(statement, params)]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["rank"], rows[-1]["id"])
+    return rows, next_cursor
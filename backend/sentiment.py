@@ -0,0 +1,159 @@
+from abc import ABC, abstractmethod
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "textblob")
+LEXICON_PATH = os.getenv("SENTIMENT_LEXICON_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentiment_lexicon.json"))
+
+# Splits text the way TextBlob does: "wasn't" becomes was / n / ' / t, so a contraction never reads as a
+# negation (TextBlob's own "n't" negation never fires), and every apostrophe is a token of its own
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?=n't)|[a-z0-9]+(?:-[a-z0-9]+)*|[^\sa-z0-9]")
+
+
+class SentimentBackend(ABC):
+    name = ""
+
+    @abstractmethod
+    def polarity(self, text: str) -> float:
+        ...
+
+    def polarities(self, texts: List[str]) -> List[float]:
+        return [self.polarity(text) for text in texts]
+
+
+class TextBlobBackend(SentimentBackend):
+    name = "textblob"
+
+    def polarity(self, text: str) -> float:
+        from textblob import TextBlob
+        return TextBlob(text).sentiment.polarity
+
+
+class LexiconBackend(SentimentBackend):
+    name = "lexicon"
+
+    def __init__(self, path: str = LEXICON_PATH):
+        with open(path) as f:
+            lexicon = json.load(f)
+        self.words: Dict[str, List[float]] = lexicon["words"]
+        self.modifiers = frozenset(lexicon["modifiers"])
+        self.negations = frozenset(lexicon["negations"])
+
+    def assessments(self, tokens: List[str]) -> List[float]:
+        words, modifiers, negations = self.words, self.modifiers, self.negations
+        scored = []
+        modifier = negation = None
+        for token in tokens:
+            entry = words.get(token)
+            if entry is not None:
+                polarity, intensity = entry
+                if modifier is None:
+                    scored.append([polarity, intensity, False])
+                else:
+                    scored[-1][0] = max(-1.0, min(polarity * scored[-1][1], 1.0))
+                    scored[-1][1] = intensity
+                if negation is not None:
+                    scored[-1][1] = 1.0 / scored[-1][1]
+                    scored[-1][2] = True
+                modifier = token if token in modifiers else None
+                negation = token if token in negations else None
+                continue
+
+            if token in negations:
+                negation = token
+            elif negation and len(token.strip("'")) > 1:
+                negation = None
+            if negation is not None and modifier is not None and modifier.endswith("ly"):
+                scored[-1][2] = True
+                negation = None
+            elif modifier and len(token) > 2:
+                modifier = None
+            if token == "!" and scored:
+                scored[-1][0] = max(-1.0, min(scored[-1][0] * 1.25, 1.0))
+        return [polarity * -0.5 if negated else polarity for polarity, _, negated in scored]
+
+    def polarity(self, text: str) -> float:
+        scores = self.assessments(_TOKEN_RE.findall(text.lower()))
+        return sum(scores) / len(scores) if scores else 0.0
+
+    def polarities(self, texts: List[str]) -> List[float]:
+        import numpy as np
+        owners, scores = [], []
+        for i, text in enumerate(texts):
+            assessed = self.assessments(_TOKEN_RE.findall(text.lower()))
+            owners.extend([i] * len(assessed))
+            scores.extend(assessed)
+        totals = np.bincount(owners, weights=scores, minlength=len(texts))
+        counts = np.bincount(owners, minlength=len(texts))
+        return np.divide(totals, counts, out=np.zeros(len(texts)), where=counts > 0).tolist()
+
+
+BACKENDS = {backend.name: backend for backend in (TextBlobBackend, LexiconBackend)}
+
+_lock = threading.Lock()
+_instances: Dict[str, SentimentBackend] = {}
+
+
+def get_backend(name: Optional[str] = None) -> SentimentBackend:
+    name = name or SENTIMENT_BACKEND
+    backend = _instances.get(name)
+    if backend is None:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown sentiment backend '{name}', expected one of {', '.join(BACKENDS)}")
+        with _lock:
+            backend = _instances.setdefault(name, BACKENDS[name]())
+    return backend
+
+
+def build_lexicon(path: str = LEXICON_PATH) -> int:
+    from textblob.en import sentiment as pattern_sentiment
+    pattern_sentiment.load()
+    words = {}
+    modifiers = []
+    for word in sorted(dict.keys(pattern_sentiment)):
+        senses = dict.__getitem__(pattern_sentiment, word)
+        polarity, _, intensity = senses[None]
+        words[word] = [round(polarity, 6), round(intensity, 6)]
+        if any(pos in senses for pos in pattern_sentiment.modifiers):
+            modifiers.append(word)
+    with open(path, "w") as f:
+        json.dump({"negations": sorted(pattern_sentiment.negations), "modifiers": modifiers, "words": words}, f, separators=(",", ":"))
+    return len(words)
+
+
+def parity_report(texts: List[str], candidate: str = "lexicon", reference: str = "textblob") -> Dict:
+    import time
+    import numpy as np
+
+    report = {"texts": len(texts), "reference": reference, "candidate": candidate}
+    if not texts:
+        return report
+
+    scores, seconds = {}, {}
+    for name in (reference, candidate):
+        backend = get_backend(name)
+        started = time.perf_counter()
+        scores[name] = np.asarray(backend.polarities(texts), dtype=float)
+        seconds[name] = max(time.perf_counter() - started, 1e-9)
+
+    expected, actual = scores[reference], scores[candidate]
+    diff = np.abs(actual - expected)
+    varied = len(texts) > 1 and expected.std() > 0 and actual.std() > 0
+    return {
+        **report,
+        "mean_abs_diff": round(float(diff.mean()), 6),
+        "max_abs_diff": round(float(diff.max()), 6),
+        "exact": round(float((diff < 1e-9).mean()), 4),
+        "within_0_05": round(float((diff <= 0.05).mean()), 4),
+        "sign_agreement": round(float((np.sign(expected) == np.sign(actual)).mean()), 4),
+        "correlation": round(float(np.corrcoef(expected, actual)[0, 1]), 6) if varied else None,
+        "texts_per_sec": {name: round(len(texts) / elapsed, 1) for name, elapsed in seconds.items()},
+        "speedup": round(seconds[reference] / seconds[candidate], 1),
+        "largest_diffs": [
+            {"text": texts[i], reference: round(float(expected[i]), 4), candidate: round(float(actual[i]), 4)}
+            for i in np.argsort(-diff)[:5] if diff[i] > 0
+        ]
+    }
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from feature_store import load_features
+from models import Score
+from scoring import compute_value_score, np, rubric_feedback_scores
+
+
+def rank_values(event_ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # 1 is the highest value; ties go to the lower event id so the order is stable between requests
+    order = np.lexsort((event_ids, -values))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(1, len(order) + 1)
+    return ranks
+
+
+def rank_correlation(before: np.ndarray, after: np.ndarray) -> Optional[float]:
+    # Spearman's rho; both rankings are permutations of 1..n so the closed form is exact
+    n = len(before)
+    if n < 2:
+        return None
+    d = (before - after).astype(float)
+    return float(1 - 6 * (d @ d) / (n * (n * n - 1)))
+
+
+def simulate_rankings(db: Session, weights: Dict[str, float], rubric: Optional[Dict[str, float]] = None) -> Dict:
+    # Everything comes from stored scores and the feature store; no feedback text is re-analyzed
+    rows = db.query(Score.event_id, Score.feedback_score, Score.revenue_score, Score.value_score).all()
+    # Plain tuples: numpy probes Row objects for the array interface, which is far slower than the query
+    data = np.array([tuple(row) for row in rows], dtype=float).reshape(-1, 4)
+    event_ids = data[:, 0].astype(np.int64)
+    feedback = data[:, 1].copy()
+    revenue = data[:, 2]
+    current = data[:, 3]
+
+    rescored = 0
+    if rubric is not None and len(event_ids):
+        found, X = load_features(db, event_ids.tolist())
+        if found:
+            positions = {event_id: i for i, event_id in enumerate(event_ids.tolist())}
+            feedback[[positions[event_id] for event_id in found]] = rubric_feedback_scores(np.asarray(X, dtype=float), rubric)
+        rescored = len(found)
+
+    total = weights["feedback"] + weights["revenue"]
+    weights = {key: value / total for key, value in weights.items()}
+    values = compute_value_score(feedback, revenue, weights)
+    current_ranks = rank_values(event_ids, current)
+    ranks = rank_values(event_ids, values)
+    return {
+        "weights": weights,
+        "rescored": rescored,
+        "event_ids": event_ids,
+        "feedback_scores": feedback,
+        "revenue_scores": revenue,
+        "current_values": current,
+        "current_ranks": current_ranks,
+        "values": values,
+        "ranks": ranks,
+        "rank_correlation": rank_correlation(current_ranks, ranks)
+    }
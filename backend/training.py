@@ -0,0 +1,134 @@
+import threading
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, lock_for_write
+from model_cache import invalidate_model_cache
+from models import ModelState, Score, TrainingLabel, TrainingStats
+from response_cache import MODEL, invalidate
+from feature_store import load_features
+from scoring import FEATURE_ORDER, empty_training_stats, feature_vector, np, solve_ridge, training_stats_from_matrix, update_training_stats
+
+STATS_FIELDS = list(empty_training_stats().keys())
+
+_retrain_lock = threading.Lock()
+
+
+def _stats_to_dict(row: TrainingStats) -> Dict:
+    return {field: getattr(row, field) for field in STATS_FIELDS}
+
+
+def _store(row: TrainingStats, stats: Dict):
+    for field in STATS_FIELDS:
+        setattr(row, field, stats[field])
+
+
+def rebuild_training_stats(db: Session) -> TrainingStats:
+    labels = {label.event_id: label for label in db.query(TrainingLabel).join(Score, TrainingLabel.event_id == Score.event_id)}
+    found, X = load_features(db, list(labels))
+    X = X.astype(float)
+    for event_id, x in zip(found, X.tolist()):
+        labels[event_id].feature_vector = x
+    stats = training_stats_from_matrix(X, [labels[event_id].admin_label for event_id in found])
+
+    row = db.query(TrainingStats).order_by(TrainingStats.id).first()
+    if row is None:
+        row = TrainingStats()
+        db.add(row)
+    _store(row, stats)
+    # Sessions do not autoflush; without this the next load in the same transaction would miss the row and add another
+    db.flush()
+    return row
+
+
+def _label(db: Session, event_id: int) -> Optional[TrainingLabel]:
+    return db.query(TrainingLabel).filter(TrainingLabel.event_id == event_id).populate_existing().first()
+
+
+def load_training_stats(db: Session) -> TrainingStats:
+    # The statistics are read, updated in Python and written back; the row stays locked until the caller
+    # commits so a second writer, in this process or another, waits instead of overwriting our update
+    lock_for_write(db, TrainingStats.__table__)
+    row = db.query(TrainingStats).order_by(TrainingStats.id).with_for_update().populate_existing().first()
+    if row is None or row.feature_order != FEATURE_ORDER:
+        row = rebuild_training_stats(db)
+    return row
+
+
+def record_label(db: Session, event_id: int, admin_label: float, features: Dict) -> Dict:
+    row = load_training_stats(db)
+    stats = _stats_to_dict(row)
+    x = feature_vector(features)
+
+    label = _label(db, event_id)
+    if label is None:
+        db.add(TrainingLabel(event_id=event_id, admin_label=admin_label, feature_vector=x))
+    else:
+        if label.feature_vector is not None:
+            stats = update_training_stats(stats, label.feature_vector, label.admin_label, weight=-1)
+        label.admin_label = admin_label
+        label.feature_vector = x
+
+    stats = update_training_stats(stats, x, admin_label)
+    _store(row, stats)
+    return stats
+
+
+def remove_label(db: Session, event_id: int) -> bool:
+    # Lock first: the label's stored vector is what gets subtracted, so it must be read under the lock too
+    row = load_training_stats(db)
+    label = _label(db, event_id)
+    if label is None or label.feature_vector is None:
+        return False
+
+    _store(row, update_training_stats(_stats_to_dict(row), label.feature_vector, label.admin_label, weight=-1))
+    label.feature_vector = None
+    return True
+
+
+def sync_label_features(db: Session, event_id: int, features: Dict) -> bool:
+    row = load_training_stats(db)
+    label = _label(db, event_id)
+    if label is None:
+        return False
+    x = feature_vector(features)
+    # Rebuilt labels hold float32 rows from the feature store; only a real change should move the statistics
+    if label.feature_vector is not None and np.allclose(label.feature_vector, x, rtol=1e-6, atol=1e-7):
+        return False
+
+    stats = _stats_to_dict(row)
+    if label.feature_vector is not None:
+        stats = update_training_stats(stats, label.feature_vector, label.admin_label, weight=-1)
+    stats = update_training_stats(stats, x, label.admin_label)
+    label.feature_vector = x
+    _store(row, stats)
+    return True
+
+
+def retrain_model(db: Session) -> Optional[Dict]:
+    stats = _stats_to_dict(load_training_stats(db))
+    weights = solve_ridge(stats)
+    if weights is None:
+        db.commit()
+        return None
+
+    model_state = db.query(ModelState).first()
+    if model_state:
+        model_state.weights = weights
+        model_state.trained_on_n = stats["n"]
+        model_state.version += 1
+    else:
+        db.add(ModelState(weights=weights, trained_on_n=stats["n"]))
+    db.commit()
+    invalidate_model_cache()
+    invalidate(MODEL)
+    return weights
+
+
+def retrain_in_background():
+    with _retrain_lock:
+        db = SessionLocal()
+        try:
+            retrain_model(db)
+        finally:
+            db.close()
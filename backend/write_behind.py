@@ -0,0 +1,243 @@
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from ingest import store_feedbacks
+from metrics import registry, timer
+from models import Event
+from respondents import consume_tokens, ensure_tokens, known_tokens, token_counts
+from response_cache import invalidate, score_scope
+from scoring import analyze_feedbacks
+
+FEEDBACK_WRITE_MODE = os.getenv("FEEDBACK_WRITE_MODE", "direct")
+GROUP_COMMIT_MAX_ITEMS = int(os.getenv("GROUP_COMMIT_MAX_ITEMS", "64"))
+GROUP_COMMIT_MAX_DELAY_MS = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", "10"))
+
+WRITE_MODES = ("direct", "group")
+
+_STOP = object()
+
+
+class PendingFeedback:
+    def __init__(self, event_id: int, respondent_id: str, text: str, rating: Optional[int]):
+        self.event_id = event_id
+        self.respondent_id = respondent_id
+        self.item = {"respondent_id": respondent_id, "text": text, "rating": rating}
+        self.analysis: Dict = {}
+        self.future: Future = Future()
+
+
+class GroupCommitQueue:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_items: int = GROUP_COMMIT_MAX_ITEMS,
+        max_delay_ms: float = GROUP_COMMIT_MAX_DELAY_MS
+    ):
+        self.session_factory = session_factory
+        self.max_items = max(1, max_items)
+        self.max_delay = max(0.0, max_delay_ms) / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self._batch: List[PendingFeedback] = []
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if not self.running:
+                self._error = None
+                self._thread = threading.Thread(target=self._run, name="feedback-group-commit", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, event_id: int, respondent_id: str, text: str, rating: Optional[int]) -> Future:
+        if not self.running:
+            raise HTTPException(status_code=503, detail=self._unavailable())
+        pending = PendingFeedback(event_id, respondent_id, text, rating)
+        self._queue.put(pending)
+        if not self.running:
+            # The writer exited between the check and the put; nothing would ever take this item
+            self._fail_queued(HTTPException(status_code=503, detail=self._unavailable()))
+        return pending.future
+
+    def _unavailable(self) -> str:
+        if self._error is not None:
+            return f"Feedback queue stopped after an error: {self._error!r}"
+        return "Feedback queue is not running"
+
+    def _fail_queued(self, exc: BaseException):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and not item.future.done():
+                item.future.set_exception(exc)
+
+    def _run(self):
+        try:
+            self._loop()
+        except BaseException as exc:
+            self._error = exc
+            registry.inc("psa_group_commit_crashes_total")
+            unavailable = HTTPException(status_code=503, detail=self._unavailable())
+            for pending in self._batch:
+                if not pending.future.done():
+                    pending.future.set_exception(unavailable)
+            self._fail_queued(unavailable)
+            raise
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_items:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._batch = batch
+            self._flush(batch)
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                self._batch = [item]
+                self._flush(self._batch)
+
+    def _flush(self, batch: List[PendingFeedback]):
+        try:
+            registry.observe("psa_group_commit_batch_size", len(batch))
+            self._write(self._analyze(batch))
+        except Exception as exc:
+            # Never leave a request waiting on a batch the writer gave up on
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+
+    def _analyze(self, batch: List[PendingFeedback]) -> List[PendingFeedback]:
+        try:
+            analyses = analyze_feedbacks([pending.item["text"] for pending in batch])
+        except Exception:
+            # Retry one by one so a text the sentiment backend chokes on only fails its own submission
+            analyses = []
+            for pending in batch:
+                try:
+                    analyses.extend(analyze_feedbacks([pending.item["text"]]))
+                except Exception as exc:
+                    pending.future.set_exception(exc)
+                    analyses.append(None)
+        analyzed = []
+        for pending, analysis in zip(batch, analyses):
+            if analysis is not None:
+                pending.analysis = analysis
+                analyzed.append(pending)
+        return analyzed
+
+    def _write(self, batch: List[PendingFeedback]):
+        if not batch:
+            return
+        try:
+            results = self._commit(batch)
+        except Exception:
+            results = {}
+            for pending in batch:
+                try:
+                    results.update(self._commit([pending]))
+                except IntegrityError:
+                    results[id(pending)] = HTTPException(status_code=400, detail="Feedback already submitted for this respondent")
+                except Exception as exc:
+                    results[id(pending)] = exc
+
+        for pending in batch:
+            result = results[id(pending)]
+            if isinstance(result, BaseException):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
+        invalidate(*{score_scope(p.event_id) for p in batch if not isinstance(results[id(p)], BaseException)})
+
+    def _commit(self, batch: List[PendingFeedback]) -> Dict[int, object]:
+        results: Dict[int, object] = {}
+        db = self.session_factory()
+        try:
+            by_event = defaultdict(list)
+            for pending in batch:
+                by_event[pending.event_id].append(pending)
+            existing = {event_id for (event_id,) in db.query(Event.id).filter(Event.id.in_(by_event))}
+
+            accepted = {}
+            for event_id, pendings in by_event.items():
+                if event_id not in existing:
+                    for pending in pendings:
+                        results[id(pending)] = HTTPException(status_code=404, detail="Event not found")
+                    continue
+                ensure_tokens(db, event_id)
+                requested = {pending.respondent_id for pending in pendings}
+                known = known_tokens(db, event_id, requested)
+                claimed = consume_tokens(db, event_id, known)
+                accepted[event_id] = []
+                for pending in pendings:
+                    if pending.respondent_id in claimed:
+                        claimed.discard(pending.respondent_id)
+                        accepted[event_id].append(pending)
+                    elif pending.respondent_id in known:
+                        results[id(pending)] = HTTPException(status_code=400, detail="Feedback already submitted for this respondent")
+                    else:
+                        results[id(pending)] = HTTPException(status_code=400, detail="Unknown respondent ID")
+
+            for event_id, group in accepted.items():
+                if not group:
+                    continue
+                with timer("db.store_feedbacks"):
+                    aggregate = store_feedbacks(db, event_id, [p.item for p in group], [p.analysis for p in group])
+                remaining = token_counts(db, event_id)["remaining"]
+                first_count = aggregate["feedback_count"] - len(group) + 1
+                for offset, pending in enumerate(group):
+                    results[id(pending)] = {
+                        "message": "Feedback submitted",
+                        "total_feedbacks": first_count + offset,
+                        "remaining": remaining + len(group) - 1 - offset
+                    }
+            with timer("db.group_commit"):
+                db.commit()
+            return results
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+feedback_queue = GroupCommitQueue()
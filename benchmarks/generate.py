@@ -0,0 +1,153 @@
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, init_db
+from models import Event, EventFeatureAggregate, Feedback, RespondentToken, TrainingLabel
+from rescore import upsert_scores
+from revenue import mark_stale_scores, refresh_stale_scores
+from scoring import CATEGORY_KEYWORDS, NEGATIVE_WORDS, POSITIVE_WORDS, RevenueIndex, aggregate_feedbacks, analyze_feedbacks, score_events
+from training import rebuild_training_stats, retrain_model
+
+FEEDBACKS_PER_EVENT = 30
+POOL_SIZE = 40
+CHUNK_SIZE = 500
+
+POSITIVE_TEMPLATES = ["The {kw} was {word}.", "Really {word} {kw}, would come again.", "{word} {kw} overall!"]
+NEGATIVE_TEMPLATES = ["The {kw} felt {word}.", "Honestly the {kw} was {word}.", "A bit {word} when it came to the {kw}."]
+
+
+def _clause(rng: random.Random, positive: bool) -> str:
+    keyword = rng.choice(rng.choice(list(CATEGORY_KEYWORDS.values())))
+    if positive:
+        return rng.choice(POSITIVE_TEMPLATES).format(kw=keyword, word=rng.choice(POSITIVE_WORDS)).capitalize()
+    return rng.choice(NEGATIVE_TEMPLATES).format(kw=keyword, word=rng.choice(NEGATIVE_WORDS)).capitalize()
+
+
+def build_text_pool(rng: random.Random, max_clauses: int = 3) -> Dict[Tuple[int, int], List[Dict]]:
+    pool = {}
+    for clauses in range(1, max_clauses + 1):
+        for positive in range(clauses + 1):
+            texts = set()
+            while len(texts) < POOL_SIZE:
+                flags = [True] * positive + [False] * (clauses - positive)
+                rng.shuffle(flags)
+                texts.add(" ".join(_clause(rng, flag) for flag in flags))
+            texts = sorted(texts)
+            pool[(clauses, positive)] = [{"text": text, **analysis} for text, analysis in zip(texts, analyze_feedbacks(texts))]
+    return pool
+
+
+def _event_feedbacks(rng: random.Random, pool: Dict, quality: float) -> List[Dict]:
+    max_clauses = max(clauses for clauses, _ in pool)
+    feedbacks = []
+    for _ in range(FEEDBACKS_PER_EVENT):
+        clauses = rng.randint(1, max_clauses)
+        positive = sum(rng.random() < quality for _ in range(clauses))
+        rating = None if rng.random() < 0.2 else min(5, max(1, round(1 + 4 * quality + rng.gauss(0, 0.7))))
+        feedbacks.append({**rng.choice(pool[(clauses, positive)]), "rating": rating})
+    return feedbacks
+
+
+def populate(db: Session, n_events: int, seed: int = 42, label_fraction: float = 0.1) -> Dict:
+    rng = random.Random(seed)
+    pool = build_text_pool(rng)
+    now = datetime.now(timezone.utc)
+    labels = 0
+
+    for start in range(0, n_events, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, n_events - start)
+        qualities = [rng.uniform(0.15, 0.95) for _ in range(size)]
+        events = []
+        for i in range(size):
+            attendance = rng.randint(20, 400)
+            revenue = round(attendance * rng.uniform(0, 40), 2)
+            events.append(Event(
+                name=f"Synthetic Event {start + i + 1}",
+                attendance=attendance,
+                revenue=revenue,
+                revenue_per_attendee=revenue / attendance
+            ))
+        db.add_all(events)
+        db.flush()
+
+        feedback_rows, token_rows, aggregate_rows, batch = [], [], [], []
+        for event, quality in zip(events, qualities):
+            feedbacks = _event_feedbacks(rng, pool, quality)
+            aggregate = aggregate_feedbacks(feedbacks)
+            for j, f in enumerate(feedbacks):
+                respondent_id = f"R-{event.id:05d}{j:02d}"
+                feedback_rows.append({
+                    "event_id": event.id,
+                    "respondent_id": respondent_id,
+                    "text": f["text"],
+                    "rating": f["rating"],
+                    "polarity": f["polarity"],
+                    "keyword_hits": f["hits"]
+                })
+                token_rows.append({"event_id": event.id, "token": respondent_id, "consumed": True, "consumed_at": now})
+            aggregate_rows.append({"event_id": event.id, **aggregate})
+            batch.append({"event_id": event.id, "revenue": event.revenue, "attendance": event.attendance, "aggregate": aggregate})
+
+        db.execute(insert(Feedback), feedback_rows)
+        db.execute(insert(RespondentToken), token_rows)
+        db.execute(insert(EventFeatureAggregate), aggregate_rows)
+
+        revenue_index = RevenueIndex(sorted(e.revenue_per_attendee for e in db.query(Event.revenue_per_attendee)))
+        scores, explanations = score_events(batch, revenue_index=revenue_index)
+        score_rows = []
+        for row, explanation, quality in zip(scores, explanations, qualities):
+            score_rows.append({
+                "event_id": int(row["event_id"]),
+                "revenue_score": float(row["revenue_score"]),
+                "feedback_score": float(row["feedback_score"]),
+                "value_score": float(row["value_score"]),
+                "feature_vector": explanation.pop("features"),
+                "explanation": explanation,
+                "model_version": None,
+                "benchmark_min": float(row["benchmark_min"]),
+                "benchmark_max": float(row["benchmark_max"]),
+                "benchmark_n": int(row["benchmark_n"]),
+                "revenue_stale": False
+            })
+            if rng.random() < label_fraction:
+                admin_label = min(100.0, max(0.0, 100 * quality + rng.gauss(0, 5)))
+                db.add(TrainingLabel(event_id=int(row["event_id"]), admin_label=round(admin_label, 1)))
+                labels += 1
+        upsert_scores(db, score_rows)
+        db.commit()
+
+    # Early batches were benchmarked against fewer events than the finished database holds
+    mark_stale_scores(db)
+    refresh_stale_scores(db)
+    rebuild_training_stats(db)
+    retrain_model(db)
+    return {"events": n_events, "feedbacks": n_events * FEEDBACKS_PER_EVENT, "labels": labels, "seed": seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill the database at DATABASE_URL with synthetic events and feedback")
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label-fraction", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        report = populate(db, args.events, args.seed, args.label_fraction)
+    finally:
+        db.close()
+    print(f"Generated {report['events']} events, {report['feedbacks']} feedbacks and {report['labels']} labels (seed {report['seed']})")
+
+
+if __name__ == "__main__":
+    main()
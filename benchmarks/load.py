@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARK_DIR, "..", "backend")
+DEFAULT_MIX = "submit=70,score=15,history=5,calibrate=5,model=5"
+LOCKED = "database is locked"
+
+OPENERS = ["The event was", "Honestly it was", "Overall the night was", "I thought it was", "This year it was"]
+VERDICTS = ["amazing", "great", "fun", "fine", "a bit disappointing", "boring at times", "really memorable", "too long"]
+DETAILS = [
+    "the food was delicious", "the venue was crowded", "registration was smooth", "the speakers were engaging",
+    "it started late", "everyone was welcoming", "there weren't enough halal options", "the schedule felt rushed",
+    "seating was comfortable", "the atmosphere had great energy"
+]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown action '{name.strip()}', expected one of {', '.join(ACTIONS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.locked: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.samples[route].append((time.perf_counter() - started) * 1000)
+            self.statuses[route][type(exc).__name__] += 1
+            return None
+        self.samples[route].append((time.perf_counter() - started) * 1000)
+        self.statuses[route][str(response.status_code)] += 1
+        if response.status_code >= 500 and LOCKED in response.text:
+            self.locked[route] += 1
+        return response
+
+    def report(self, seconds: float) -> Dict:
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            statuses = dict(self.statuses[route])
+            errors = sum(n for status, n in statuses.items() if not status.isdigit() or int(status) >= 500)
+            routes[route] = {
+                "requests": len(samples),
+                "per_sec": round(len(samples) / seconds, 1),
+                "p50_ms": round(percentile(samples, 0.50), 2),
+                "p95_ms": round(percentile(samples, 0.95), 2),
+                "p99_ms": round(percentile(samples, 0.99), 2),
+                "max_ms": round(samples[-1], 2),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4),
+                "locked": self.locked[route],
+                "statuses": statuses
+            }
+        total = sum(r["requests"] for r in routes.values())
+        return {
+            "seconds": round(seconds, 2),
+            "requests": total,
+            "per_sec": round(total / seconds, 1) if seconds else 0.0,
+            "errors": sum(r["errors"] for r in routes.values()),
+            "routes": routes
+        }
+
+
+class Scenario:
+    # Shared event-night state: events with unused respondent IDs, events that have been scored
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, rng: random.Random, events: int):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.target_events = events
+        self.open: Dict[int, List[str]] = {}
+        self.outstanding: Dict[int, int] = {}
+        self.scored: List[int] = []
+        self._creating = asyncio.Lock()
+
+    async def create_event(self) -> bool:
+        i = len(self.open) + len(self.scored)
+        response = await self.recorder.request(
+            self.client, "POST /api/events", "POST", "/api/events",
+            json={"name": f"Load test {i}", "attendance": self.rng.randint(20, 300), "revenue": round(self.rng.uniform(0, 5000), 2)}
+        )
+        if response is None or response.status_code != 200:
+            return False
+        event_id = response.json()["id"]
+        response = await self.recorder.request(self.client, "GET /api/events/{id}/respondents", "GET", f"/api/events/{event_id}/respondents")
+        if response is not None and response.status_code == 200:
+            tokens = [t if isinstance(t, str) else t["respondent_id"] for t in response.json()["respondents"]]
+            self.rng.shuffle(tokens)
+            self.open[event_id] = tokens
+            self.outstanding[event_id] = len(tokens)
+            return True
+        return False
+
+    async def fill(self):
+        async with self._creating:
+            while len(self.open) < self.target_events:
+                if not await self.create_event():
+                    return
+
+    def text(self) -> str:
+        return f"{self.rng.choice(OPENERS)} {self.rng.choice(VERDICTS)}, {self.rng.choice(DETAILS)} and {self.rng.choice(DETAILS)}."
+
+    async def submit(self):
+        if not self.open:
+            await self.fill()
+            if not self.open:
+                return
+        event_id = self.rng.choice(list(self.open))
+        tokens = self.open[event_id]
+        token = tokens.pop()
+        if not tokens:
+            del self.open[event_id]
+        rating = self.rng.choice([None, 3, 4, 4, 5, 5])
+        response = await self.recorder.request(
+            self.client, "POST /api/events/{id}/feedbacks", "POST", f"/api/events/{event_id}/feedbacks",
+            params={"respondent_id": token}, json={"text": self.text(), "rating": rating}
+        )
+        self.outstanding[event_id] -= 1
+        if self.outstanding[event_id] == 0:
+            # Every respondent has answered: the organizer computes the score and the night moves on to another event
+            response = await self.recorder.request(self.client, "POST /api/events/{id}/compute-score", "POST", f"/api/events/{event_id}/compute-score")
+            if response is not None and response.status_code == 200:
+                self.scored.append(event_id)
+            await self.fill()
+
+    async def score(self):
+        if not self.scored:
+            await self.recorder.request(self.client, "GET /api/events", "GET", "/api/events", params={"limit": 50})
+            return
+        event_id = self.rng.choice(self.scored)
+        await self.recorder.request(self.client, "GET /api/events/{id}/score", "GET", f"/api/events/{event_id}/score")
+
+    async def history(self):
+        await self.recorder.request(self.client, "GET /api/history", "GET", "/api/history", params={"limit": 50})
+
+    async def calibrate(self):
+        if not self.scored:
+            return await self.model()
+        event_id = self.rng.choice(self.scored)
+        await self.recorder.request(
+            self.client, "POST /api/events/{id}/calibrate", "POST", f"/api/events/{event_id}/calibrate",
+            json={"admin_label": round(self.rng.uniform(30, 95), 1)}
+        )
+
+    async def model(self):
+        await self.recorder.request(self.client, "GET /api/model-status", "GET", "/api/model-status")
+
+
+ACTIONS = {
+    "submit": Scenario.submit,
+    "score": Scenario.score,
+    "history": Scenario.history,
+    "calibrate": Scenario.calibrate,
+    "model": Scenario.model
+}
+
+
+async def drive(base_url: str, mix: Dict[str, float], concurrency: int, duration: float, events: int, think_ms: float, seed: int) -> Dict:
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        warmup = Scenario(client, Recorder(), random.Random(seed), 1)
+        await warmup.fill()
+        await warmup.submit()
+
+        recorder = Recorder()
+        scenario = Scenario(client, recorder, rng, events)
+        await scenario.fill()
+        deadline = time.perf_counter() + duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                await ACTIONS[rng.choices(names, weights)[0]](scenario)
+                if think_ms:
+                    await asyncio.sleep(rng.expovariate(1000 / think_ms))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return recorder.report(time.perf_counter() - started)
+
+
+def start_server(tmp: str, port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'load.db')}", **env}
+    # Create the schema up front so several workers starting at once don't race to create it
+    subprocess.run([sys.executable, "-c", "import models; from database import init_db; init_db()"], cwd=BACKEND_DIR, env=env, check=True)
+    log = open(os.path.join(tmp, "server.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def wait_until_ready(server: subprocess.Popen, base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode} before becoming ready")
+        try:
+            if httpx.get(f"{base_url}/api/model-status", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Server did not become ready within {timeout}s")
+
+
+def print_report(report: Dict):
+    print(f"{'route':38} {'req':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8} {'locked':>7}")
+    for route, stats in report["routes"].items():
+        print(f"{route:38} {stats['requests']:>7} {stats['per_sec']:>8.1f} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+              f"{stats['p99_ms']:>9.2f} {stats['error_rate']:>8.2%} {stats['locked']:>7}")
+    print(f"{report['requests']} requests in {report['seconds']}s ({report['per_sec']} req/s), {report['errors']} errors, "
+          f"'{LOCKED}' {report['server_locked']} times in the server log")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive a local uvicorn instance with concurrent event-night traffic")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Weighted actions, from {', '.join(ACTIONS)} (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=32, help="Simulated users issuing requests at once")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run after warmup")
+    parser.add_argument("--events", type=int, default=5, help="Events collecting feedback at the same time")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a user's requests")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra server environment, e.g. FEEDBACK_WRITE_MODE=group")
+    parser.add_argument("--url", help="Load an already running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    env = dict(item.split("=", 1) for item in args.env)
+    with tempfile.TemporaryDirectory() as tmp:
+        server = None
+        base_url = args.url
+        if base_url is None:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(tmp, port, args.workers, env)
+        try:
+            if server is not None:
+                wait_until_ready(server, base_url)
+            report = asyncio.run(drive(base_url, args.mix, args.concurrency, args.duration, args.events, args.think_ms, args.seed))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        server_log = ""
+        if server is not None:
+            with open(os.path.join(tmp, "server.log")) as f:
+                server_log = f.read()
+
+    report.update({
+        "mix": args.mix,
+        "concurrency": args.concurrency,
+        "events": args.events,
+        "workers": args.workers,
+        "env": env,
+        "server_locked": server_log.count(LOCKED)
+    })
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARK_DIR, "..", "backend")
+DEFAULT_SIZES = [10, 1000]
+
+PROBE = """
+import json, sys
+sys.path.insert(0, {benchmarks!r})
+from sqlalchemy import event, text
+from fastapi.testclient import TestClient
+from database import SessionLocal, engine, init_db, read_engine
+from generate import populate
+from response_cache import invalidate_all
+
+init_db()
+db = SessionLocal()
+populate(db, {size}, {seed})
+event_id = db.execute(text("SELECT max(id) FROM events")).scalar()
+db.close()
+
+statements = []
+def count(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+for bound in {{engine, read_engine}}:
+    event.listen(bound, "before_cursor_execute", count)
+
+import main
+counts = {{}}
+with TestClient(main.app) as client:
+    for name, url in [("/api/events", "/api/events"), ("/api/events/{{id}}", f"/api/events/{{event_id}}"), ("/api/history", "/api/history")]:
+        invalidate_all()
+        statements.clear()
+        client.get(url).raise_for_status()
+        counts[name] = len(statements)
+print(json.dumps(counts))
+"""
+
+
+def probe(size: int, seed: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'queries.db')}"}
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(benchmarks=BENCHMARK_DIR, size=size, seed=seed)],
+            env=env, cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the list endpoints issue the same number of queries however many events exist")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--max-queries", type=int, default=2, help="Upper bound on statements per request")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    results = {size: probe(size, args.seed) for size in args.sizes}
+    failures = []
+    for endpoint in results[args.sizes[0]]:
+        counts = [results[size][endpoint] for size in args.sizes]
+        print(f"{endpoint:24} " + "  ".join(f"{count} @ {size}" for size, count in zip(args.sizes, counts)))
+        if len(set(counts)) > 1:
+            failures.append(f"{endpoint} query count grows with the number of events: {counts}")
+        if max(counts) > args.max_queries:
+            failures.append(f"{endpoint} issued {max(counts)} queries (budget {args.max_queries})")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCHMARK_DIR, "..", "backend")
+DEFAULT_SIZES = [100, 1000, 10000]
+
+
+def timed(fn: Callable, repeat: int, warmup: int = 1) -> Dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "n": repeat,
+        "min_ms": round(samples[0], 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "max_ms": round(samples[-1], 4)
+    }
+
+
+def measure(size: int, seed: int, repeat: int) -> Dict:
+    sys.path.insert(0, BACKEND_DIR)
+    sys.path.insert(0, BENCHMARK_DIR)
+    from fastapi.testclient import TestClient
+
+    from database import SessionLocal, init_db
+    from feature_store import get_feature_store, load_features
+    from generate import build_text_pool, populate, _event_feedbacks
+    from models import Event, Score, TrainingLabel
+    from scoring import compute_feedback_score, extract_features, extract_themes, train_matrix, train_model
+
+    init_db()
+    db = SessionLocal()
+    started = time.perf_counter()
+    report = populate(db, size, seed)
+    generate_seconds = time.perf_counter() - started
+
+    rng = random.Random(seed)
+    pool = build_text_pool(rng)
+    raw = [{"text": f["text"], "rating": f["rating"]} for f in _event_feedbacks(rng, pool, 0.6)]
+    training_data = [
+        {"features": features, "label": label}
+        for features, label in db.query(Score.feature_vector, TrainingLabel.admin_label).join(TrainingLabel, TrainingLabel.event_id == Score.event_id)
+    ]
+    labels = dict(db.query(TrainingLabel.event_id, TrainingLabel.admin_label))
+    labeled_ids, _ = load_features(db, list(labels))
+    event_ids = [event_id for (event_id,) in db.query(Event.id)]
+    db.close()
+    store = get_feature_store()
+
+    def train_from_store():
+        found, X = store.take(labeled_ids)
+        return train_matrix(X, [labels[event_id] for event_id in found])
+
+    results = {
+        "extract_features": timed(lambda: extract_features(raw), repeat),
+        "extract_themes": timed(lambda: extract_themes(raw), repeat),
+        "compute_feedback_score": timed(lambda: compute_feedback_score(raw), repeat),
+        "train_model": timed(lambda: train_model(training_data), repeat),
+        "train_model.feature_store": timed(train_from_store, repeat),
+        "feature_store.scan": timed(store.scan, repeat)
+    }
+
+    import main
+    from response_cache import ANALYTICS, HISTORY, invalidate
+    with TestClient(main.app) as client:
+        def request(method: str, url: str, **kwargs):
+            response = client.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response
+
+        results["api.compute_score"] = timed(lambda: request("POST", f"/api/events/{rng.choice(event_ids)}/compute-score"), repeat)
+        results["api.history"] = timed(lambda: (invalidate(HISTORY), request("GET", "/api/history")), repeat)
+        results["api.history.page"] = timed(lambda: (invalidate(HISTORY), request("GET", "/api/history", params={"limit": 50})), repeat)
+        results["api.history.cached"] = timed(lambda: request("GET", "/api/history"), repeat)
+        results["api.events"] = timed(lambda: request("GET", "/api/events"), repeat)
+        results["api.events.page"] = timed(lambda: request("GET", "/api/events", params={"limit": 50}), repeat)
+        results["api.trends"] = timed(lambda: (invalidate(ANALYTICS), request("GET", "/api/analytics/trends")), repeat)
+        results["api.search"] = timed(lambda: request("GET", "/api/search", params={"q": "crowded", "category": "venue"}), repeat)
+        results["api.simulate"] = timed(lambda: (invalidate(HISTORY), request("POST", "/api/simulate", json={"feedback_weight": 0.7, "revenue_weight": 0.3})), repeat)
+        results["api.simulate.rubric"] = timed(lambda: (invalidate(HISTORY), request("POST", "/api/simulate", json={"rubric": {"sentiment": 30, "negative": 20}})), repeat)
+        results["api.search.event"] = timed(lambda: request("GET", "/api/search", params={"category": "food", "event_id": rng.choice(event_ids)}), repeat)
+
+    return {"size": size, "generate_seconds": round(generate_seconds, 3), "data": report, "results": results}
+
+
+def run(sizes: List[int], seed: int, repeat: int) -> Dict:
+    runs = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "result.json")
+            env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}"}
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "measure", "--size", str(size), "--seed", str(seed),
+                 "--repeat", str(repeat), "--output", output],
+                env=env, cwd=tmp, check=True
+            )
+            with open(output) as f:
+                runs.append(json.load(f))
+        print(f"Measured {size} events", file=sys.stderr)
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "runs": runs
+    }
+
+
+def flatten(results: Dict) -> Dict[str, Dict]:
+    return {f"{name}@{run['size']}": stats for run in results["runs"] for name, stats in run["results"].items()}
+
+
+def compare(baseline: Dict, current: Dict, threshold: float, min_delta_ms: float) -> List[Dict]:
+    before, after = flatten(baseline), flatten(current)
+    rows = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key]["median_ms"], after[key]["median_ms"]
+        ratio = new / old if old else float("inf")
+        rows.append({
+            "benchmark": key,
+            "baseline_ms": old,
+            "current_ms": new,
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1 + threshold and new - old > min_delta_ms
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PSA Andaza performance benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Generate synthetic databases and time scoring functions and endpoints")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--repeat", type=int, default=20)
+    run_parser.add_argument("--output", default="benchmark_results.json")
+
+    measure_parser = subparsers.add_parser("measure", help=argparse.SUPPRESS)
+    measure_parser.add_argument("--size", type=int, required=True)
+    measure_parser.add_argument("--seed", type=int, default=42)
+    measure_parser.add_argument("--repeat", type=int, default=20)
+    measure_parser.add_argument("--output", required=True)
+
+    compare_parser = subparsers.add_parser("compare", help="Flag benchmarks whose median regressed against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="Allowed fractional slowdown of the median")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore slowdowns smaller than this")
+
+    args = parser.parse_args(argv)
+    if args.command == "measure":
+        with open(args.output, "w") as f:
+            json.dump(measure(args.size, args.seed, args.repeat), f)
+    elif args.command == "run":
+        results = run(args.sizes, args.seed, args.repeat)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        for key, stats in flatten(results).items():
+            print(f"{key:40} {stats['median_ms']:>12.3f} ms")
+        print(f"Wrote {args.output}")
+    elif args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['benchmark']:40} {row['baseline_ms']:>12.3f} {row['current_ms']:>12.3f} {row['ratio']:>8.2f}x {flag}")
+        regressions = [row for row in rows if row["regression"]]
+        print(f"{len(regressions)} regression(s) out of {len(rows)} benchmarks")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
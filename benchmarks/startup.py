@@ -0,0 +1,59 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+HEAVY_MODULES = ["numpy", "textblob", "nltk", "sklearn"]
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import main
+seconds = time.perf_counter() - started
+loaded = [name for name in {heavy!r} if name in sys.modules]
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+print(json.dumps({{"import_seconds": seconds, "max_rss_mb": rss_mb, "heavy_modules_loaded": loaded}}))
+"""
+
+
+def probe() -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'startup.db')}"}
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+            env=env, cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that importing the API stays within a startup time and memory budget")
+    parser.add_argument("--max-seconds", type=float, default=1.5)
+    parser.add_argument("--max-rss-mb", type=float, default=120)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = [probe() for _ in range(args.runs)]
+    seconds = min(r["import_seconds"] for r in results)
+    rss_mb = min(r["max_rss_mb"] for r in results)
+    loaded = sorted({name for r in results for name in r["heavy_modules_loaded"]})
+
+    failures = []
+    if seconds > args.max_seconds:
+        failures.append(f"import took {seconds:.3f}s (budget {args.max_seconds}s)")
+    if rss_mb > args.max_rss_mb:
+        failures.append(f"max RSS {rss_mb:.1f} MB (budget {args.max_rss_mb} MB)")
+    if loaded:
+        failures.append(f"heavy modules imported at startup: {', '.join(loaded)}")
+
+    print(f"import {seconds:.3f}s, max RSS {rss_mb:.1f} MB")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()